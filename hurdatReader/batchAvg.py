@@ -0,0 +1,304 @@
+#!/usr/bin/env python3
+'''
+Module for averaging the GPS coordinates of all storms in one batch.
+
+Works on the columns returned by hurdatReader.readColumns(). Every track point
+is converted to cartesian coordinates once, using sine/cosine tables over the
+tenth of a degree positions HURDAT stores, and the avgAll, avgMid, avgFirst
+and avgLast midpoints of every storm are then reduced over the storm
+boundaries. Results are the same as the coordAvg functions, which remain the
+reference implementation. buildSums() keeps per storm prefix sums so the
+midpoint of any window and the scale of any storm take constant time.
+
+This is plain Python over arrays, not NumPy. A single avgStorms() pass
+costs about the same as calling coordAvg for every storm (see the avgScalar
+and avgBatch stages of benchmark.py). The gain is in repeated averaging:
+sweepNumMeas() over 40 values of numMeas is several times faster than
+coordAvg (the sweepScalar and sweepBatch stages).
+
+Import and call methods.
+
+@author: David Stack
+'''
+
+__all__ = ['toCartesian', 'avgStorms', 'buildSums', 'windowAvg', 'stormScale',
+           'avgSums', 'sweepNumMeas', 'test']
+
+import math, itertools, operator
+from array import array
+
+__trigTables = {}
+
+def __trig(tenths):
+    '''Returns (cos, sin) of an angle given in tenths of a degree.'''
+    if tenths not in __trigTables:
+        angle = math.radians(tenths / 10)
+        __trigTables[tenths] = (math.cos(angle), math.sin(angle))
+    return __trigTables[tenths]
+
+def toCartesian(lats, lons):
+    '''Converts lat and lon columns (tenths of a degree) to x, y and z arrays
+    of unit vectors.'''
+    trig = __trig
+    table = dict((tenths, trig(tenths)) for tenths in set(lats).union(lons))
+    latTrig = [table[tenths] for tenths in lats]
+    lonTrig = [table[tenths] for tenths in lons]
+    xs = array('d', [lat[0] * lon[0] for lat, lon in zip(latTrig, lonTrig)])
+    ys = array('d', [lat[0] * lon[1] for lat, lon in zip(latTrig, lonTrig)])
+    zs = array('d', [lat[1] for lat in latTrig])
+    return xs, ys, zs
+
+def __midpoint(xs, ys, zs, start, stop):
+    '''Returns geographic midpoint [lat, lon] of points start to stop.'''
+    n = stop - start
+    if n:
+        x = float(sum(xs[start:stop]) / n)
+        y = float(sum(ys[start:stop]) / n)
+        z = float(sum(zs[start:stop]) / n)
+    else:
+        x = y = z = 0.0
+    lon = math.atan2(y, x)
+    hyp = math.sqrt(x * x + y * y)
+    lat = math.atan2(z, hyp)
+    return [math.degrees(lat), math.degrees(lon)]
+
+def __select(columns, indexList):
+    '''Returns lat, lon and wind arrays of the observations in indexList, the
+    first observation index of each storm and the storm bounds in the arrays.
+    Storms are runs of the same storm ID as in coordExport.'''
+    if indexList is None:
+        indexList = range(len(columns['lat']))
+        lats = columns['lat']
+        lons = columns['lon']
+        winds = array('h', columns['wind'])
+        IDs = columns['id']
+    else:
+        lats = array('h', map(columns['lat'].__getitem__, indexList))
+        lons = array('h', map(columns['lon'].__getitem__, indexList))
+        winds = array('h', map(columns['wind'].__getitem__, indexList))
+        IDs = list(map(columns['id'].__getitem__, indexList))
+    bounds = array('i', [0] if len(indexList) else [])
+    bounds.extend([k for k, prevID, ID in zip(itertools.count(1), IDs, IDs[1:]) if ID != prevID])
+    obs = array('i', [indexList[k] for k in bounds])
+    bounds.append(len(indexList))
+    return lats, lons, winds, obs, bounds
+
+def __peak(winds, start, stop):
+    '''Returns position of the first highest wind of a storm and whether the
+    first wind is the highest.'''
+    windList = winds[start:stop]
+    maxWind = max(windList)
+    return windList.index(maxWind), maxWind == windList[0]
+
+def __windows(n, mid, peakFirst, numMeas):
+    '''Returns (first, last) of the mid, first and last windows of a storm of
+    n points, chosen the same way as coordAvg.avgMid(), avgFirst() and
+    avgLast().'''
+    if peakFirst:
+        midSlice = slice(None)
+    elif mid - numMeas < 0:
+        midSlice = slice(0, mid + numMeas)
+    else:
+        midSlice = slice(mid - numMeas, mid + numMeas)
+    windows = []
+    for window in (midSlice, slice(None, numMeas), slice(-numMeas, None)):
+        first, last, step = window.indices(n)
+        windows.append((first, max(first, last)))
+    return windows
+
+def __steps(values):
+    '''Returns the degree step into every point of a column in tenths of a
+    degree, as coordAvg.__calcDif() computes it (the first entry is 0).'''
+    degrees = list(map((10).__rtruediv__, values))
+    return [0.0] + list(map(math.fabs, map(operator.sub, degrees[1:], degrees)))
+
+def __stepSum(values, steps, start, stop):
+    '''Returns the sum of the steps of a storm that coordAvg.calcScale()
+    adds: points equal to the first point of the storm are skipped as in
+    coordAvg.__calcDif().'''
+    return sum(itertools.compress(steps[start+1:stop],
+                                  map(values[start].__ne__, values[start+1:stop])))
+
+def __scale(lats, lons, latSteps, lonSteps, start, stop):
+    '''Returns coordAvg.calcScale() of a storm. The steps are the same
+    degree floats summed in the same order, so the result is identical.'''
+    return __stepSum(lats, latSteps, start, stop) * __stepSum(lons, lonSteps, start, stop)
+
+def __newResults(obs):
+    '''Returns empty results dictionary for avgStorms() and avgSums().'''
+    results = {'obs':obs, 'scale':array('d')}
+    for name in ('all', 'mid', 'first', 'last'):
+        results[name + 'Lat'] = array('d')
+        results[name + 'Lon'] = array('d')
+    return results
+
+def avgStorms(columns, numMeas=4, indexList=None):
+    '''Averages the coordinates of every storm in columns from
+    hurdatReader.readColumns().
+
+    Optionally only the observations in indexList are used, grouped by
+    consecutive storm ID as in coordExport. Returns a dictionary with an 'obs'
+    array of the first observation index of each storm and arrays 'allLat',
+    'allLon', 'midLat', 'midLon', 'firstLat', 'firstLon', 'lastLat',
+    'lastLon' and 'scale' (see coordAvg.calcScale()). Longitudes are degrees
+    west like the lon column.'''
+    lats, lons, winds, obs, bounds = __select(columns, indexList)
+    xs, ys, zs = toCartesian(lats, lons)
+    latSteps = __steps(lats)
+    lonSteps = __steps(lons)
+    results = __newResults(obs)
+    for s in range(len(obs)):
+        start = bounds[s]
+        stop = bounds[s+1]
+        mid, peakFirst = __peak(winds, start, stop)
+        windows = [(0, stop - start)] + __windows(stop - start, mid, peakFirst, numMeas)
+        for name, (first, last) in zip(('all', 'mid', 'first', 'last'), windows):
+            lat, lon = __midpoint(xs, ys, zs, start + first, start + last)
+            results[name + 'Lat'].append(lat)
+            results[name + 'Lon'].append(lon)
+        results['scale'].append(__scale(lats, lons, latSteps, lonSteps, start, stop))
+    return results
+
+def buildSums(columns, indexList=None):
+    '''Returns per storm prefix sums of the cartesian coordinates and of the
+    lat/lon steps of columns from hurdatReader.readColumns().
+
+    With them windowAvg() and stormScale() take constant time, so averages
+    can be recomputed for many numMeas (see avgSums()) without touching the
+    track points again. indexList selects observations as in avgStorms().'''
+    lats, lons, winds, obs, bounds = __select(columns, indexList)
+    xs, ys, zs = toCartesian(lats, lons)
+    sums = {'obs':obs, 'bounds':bounds, 'x':array('d'), 'y':array('d'),
+            'z':array('d'), 'dLat':array('d'), 'dLon':array('d'),
+            'peak':array('i'), 'peakFirst':array('b')}
+    for s in range(len(obs)):
+        start = bounds[s]
+        stop = bounds[s+1]
+        x = y = z = 0.0
+        dLat = dLon = 0.0
+        sums['x'].append(x)
+        sums['y'].append(y)
+        sums['z'].append(z)
+        sums['dLat'].append(dLat)
+        sums['dLon'].append(dLon)
+        for k in range(start, stop):
+            x += xs[k]
+            y += ys[k]
+            z += zs[k]
+            if k > start:
+                if lats[k] != lats[start]:
+                    dLat += math.fabs(lats[k] / 10 - lats[k-1] / 10)
+                if lons[k] != lons[start]:
+                    dLon += math.fabs(lons[k] / 10 - lons[k-1] / 10)
+            sums['x'].append(x)
+            sums['y'].append(y)
+            sums['z'].append(z)
+            sums['dLat'].append(dLat)
+            sums['dLon'].append(dLon)
+        mid, peakFirst = __peak(winds, start, stop)
+        sums['peak'].append(mid)
+        sums['peakFirst'].append(peakFirst)
+    return sums
+
+def windowAvg(sums, s, first, last):
+    '''Returns geographic midpoint [lat, lon] of points first to last (last
+    not included) of storm s from buildSums().'''
+    base = sums['bounds'][s] + s
+    n = last - first
+    if n:
+        x = (sums['x'][base + last] - sums['x'][base + first]) / n
+        y = (sums['y'][base + last] - sums['y'][base + first]) / n
+        z = (sums['z'][base + last] - sums['z'][base + first]) / n
+    else:
+        x = y = z = 0.0
+    lon = math.atan2(y, x)
+    hyp = math.sqrt(x * x + y * y)
+    lat = math.atan2(z, hyp)
+    return [math.degrees(lat), math.degrees(lon)]
+
+def stormScale(sums, s, numPoints=None):
+    '''Returns coordAvg.calcScale() of storm s from buildSums(), optionally
+    of its first numPoints points only.
+
+    The prefix sums add the same degree steps in the same order as
+    calcScale(), so the result is identical wherever sum() adds floats one
+    by one (Python 3.11 and older) and within 1e-9 otherwise.'''
+    base = sums['bounds'][s] + s
+    if numPoints is None:
+        numPoints = sums['bounds'][s+1] - sums['bounds'][s]
+    return sums['dLat'][base + numPoints] * sums['dLon'][base + numPoints]
+
+def avgSums(sums, numMeas=4):
+    '''Returns the same averages as avgStorms() (within floating point
+    rounding) from buildSums() in time proportional to the number of storms.'''
+    results = __newResults(sums['obs'])
+    bounds = sums['bounds']
+    for s in range(len(sums['obs'])):
+        n = bounds[s+1] - bounds[s]
+        windows = [(0, n)] + __windows(n, sums['peak'][s], sums['peakFirst'][s], numMeas)
+        for name, (first, last) in zip(('all', 'mid', 'first', 'last'), windows):
+            lat, lon = windowAvg(sums, s, first, last)
+            results[name + 'Lat'].append(lat)
+            results[name + 'Lon'].append(lon)
+        results['scale'].append(stormScale(sums, s))
+    return results
+
+def sweepNumMeas(columns, numMeasList, indexList=None):
+    '''Returns a dictionary of avgSums() results for every numMeas in
+    numMeasList, e.g. range(1, 41) for a sensitivity study.'''
+    sums = buildSums(columns, indexList)
+    return dict((numMeas, avgSums(sums, numMeas)) for numMeas in numMeasList)
+
+def test():
+    '''Test function.'''
+    print('---Module batchAvg test---')
+    import os, fileIO, coordAvg
+    columns = fileIO.openColumns('HURDAT_tracks1851to2010_atl_2011rev.txt',
+                                 os.path.join('..', 'data'))
+    numMeas = 4
+    results = avgStorms(columns, numMeas)
+
+    print('***avgStorms Test***')
+    stormStart = columns['stormStart']
+    worst = 0.0
+    sameScale = True
+    s = 0
+    for k in range(len(results['obs'])):
+        while stormStart[s] != results['obs'][k]:
+            s += 1
+        latList = [lat / 10 for lat in columns['lat'][stormStart[s]:stormStart[s+1]]]
+        lonList = [lon / 10 for lon in columns['lon'][stormStart[s]:stormStart[s+1]]]
+        windList = list(columns['wind'][stormStart[s]:stormStart[s+1]])
+        known = (coordAvg.avgAll(latList, lonList) +
+                 coordAvg.avgMid(latList, lonList, windList, numMeas) +
+                 coordAvg.avgFirst(latList, lonList, numMeas) +
+                 coordAvg.avgLast(latList, lonList, numMeas))
+        test = [results[name][k] for name in ('allLat', 'allLon', 'midLat', 'midLon',
+                                              'firstLat', 'firstLon', 'lastLat', 'lastLon')]
+        for a, b in zip(known, test):
+            worst = max(worst, abs(a - b))
+        sameScale = sameScale and coordAvg.calcScale(latList, lonList) == results['scale'][k]
+    # Same floats summed in the same order, so the results are identical
+    if worst != 0.0 or not sameScale:
+        print('!!!---TEST FAIL---!!!')
+        print('Largest difference:', worst, 'Same scales:', sameScale)
+    else:
+        print('PASS')
+
+    print('***sweepNumMeas Test***')
+    worst = 0.0
+    sweep = sweepNumMeas(columns, range(1, 41))
+    for numMeas in (1, 4, 40):
+        known = avgStorms(columns, numMeas)
+        for name in known:
+            for a, b in zip(known[name], sweep[numMeas][name]):
+                worst = max(worst, abs(a - b))
+    if worst > 1e-9:
+        print('!!!---TEST FAIL---!!!')
+        print('Largest difference:', worst)
+    else:
+        print('PASS')
+
+# Run test if module is run as a program
+if __name__ == '__main__':
+    test()
@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+'''
+Module for timing the HURDAT pipeline on synthetic data files.
+
+Times parsing (hurdatReader), exporting (hurdatExport), filtering
+(coordExport.__filterData), averaging (coordAvg and batchAvg, once and for a
+sweep of numMeas) and the full pipeline (the run subcommand of cli.py, as
+run by main.py) on files made by hurdatSynth at several sizes, and parsing
+and csv export through each compressor of fileIO. Throughput is always of
+the uncompressed data file. Results are saved as JSON so runs on different
+commits can be compared with compare().
+
+Run as a program:
+    python benchmark.py [scale ...] [--output results.json]
+    python benchmark.py --compare old.json new.json
+
+@author: David Stack
+'''
+
+__all__ = ['timeCall', 'runBenchmarks', 'saveResults', 'compare', 'test']
+
+import os, io, sys, json, time, shutil, tempfile, platform, subprocess
+import contextlib
+import fileIO, hurdatSynth, hurdatReader, hurdatExport, coordExport, coordAvg, batchAvg, cli
+
+def timeCall(function, *args):
+    '''Returns (seconds, result) of function(*args) with its printing hidden.'''
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        result = function(*args)
+        seconds = time.perf_counter() - start
+    return seconds, result
+
+def __commit():
+    '''Returns the current git commit or '' outside a git checkout.'''
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'],
+                                       cwd=os.path.dirname(os.path.abspath(__file__)),
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ''
+
+def __parse(filename):
+    '''Returns hurdatReader.readColumns() of filename.'''
+    hurdatData = fileIO.openFile(filename)
+    columns = hurdatReader.readColumns(hurdatData)
+    hurdatData.close()
+    return columns
+
+def __filter(filename, filterTerms):
+    '''Returns coordExport.__filterData() of a HURDAT_Export.txt file.'''
+    hurdatExport = open(filename)
+    hurdatExport.readline() # Reads headers
+    data = getattr(coordExport, '__filterData')(hurdatExport, filterTerms)
+    hurdatExport.close()
+    return data
+
+def __scalarAverages(columns, numMeas=4):
+    '''Averages every storm with the coordAvg functions.'''
+    stormStart = columns['stormStart']
+    for s in range(len(columns['stormID'])):
+        if stormStart[s] == stormStart[s+1]:
+            continue
+        latList = [lat / 10 for lat in columns['lat'][stormStart[s]:stormStart[s+1]]]
+        lonList = [lon / 10 for lon in columns['lon'][stormStart[s]:stormStart[s+1]]]
+        windList = list(columns['wind'][stormStart[s]:stormStart[s+1]])
+        coordAvg.avgAll(latList, lonList)
+        coordAvg.avgMid(latList, lonList, windList, numMeas)
+        coordAvg.avgFirst(latList, lonList, numMeas)
+        coordAvg.avgLast(latList, lonList, numMeas)
+        coordAvg.calcScale(latList, lonList)
+
+def __scalarSweep(columns, numMeasList):
+    '''Averages every storm with the coordAvg functions for every numMeas.'''
+    for numMeas in numMeasList:
+        __scalarAverages(columns, numMeas)
+
+def __pipeline(filename, outDir):
+    '''Runs the main.py pipeline (cli.py run) on filename, parsing it
+    without the cache.'''
+    cli.main(['run', '--source', filename, '--output-dir', outDir, '--no-cache'])
+
+def __compress(filename, ext):
+    '''Writes a compressed copy of filename and returns its name.'''
+    with open(filename) as source, fileIO.makeTextFile(filename + ext) as target:
+        for line in source:
+            target.write(line)
+    return target.name
+
+def __clear(outDir):
+    '''Removes earlier outputs so every run writes new files.'''
+    for name in os.listdir(outDir):
+        os.remove(os.path.join(outDir, name))
+
+def runBenchmarks(scales=(1,), repeat=1, workDir=None):
+    '''Times each stage on synthetic files of scale times the Atlantic file
+    and returns a list of result dictionaries (best of repeat runs).
+
+    Files are made in workDir, which is a new temporary folder removed at
+    the end when not given.'''
+    tmpDir = workDir is None
+    if tmpDir:
+        workDir = tempfile.mkdtemp()
+    try:
+        return __runScales(scales, repeat, workDir)
+    finally:
+        if tmpDir:
+            shutil.rmtree(workDir, ignore_errors=True)
+
+def __runScales(scales, repeat, workDir):
+    '''Runs the stages of runBenchmarks() in workDir.'''
+    outDir = os.path.join(workDir, 'output')
+    os.makedirs(outDir, exist_ok=True)
+    results = []
+    sweep = range(1, 41)
+    for scale in scales:
+        filename = os.path.join(workDir, 'synth_{0}.txt'.format(scale))
+        hurdatSynth.makeFile(filename, int(hurdatSynth.atlanticStorms * scale))
+        size = os.path.getsize(filename)
+        columns = __parse(filename)
+        txtName = os.path.join(outDir, 'HURDAT_Export.txt')
+        stages = [('parse', __parse, (filename,)),
+                  ('exportCSV', hurdatExport.exportColumnsToCSV,
+                   (columns, os.path.join(outDir, 'HURDAT_Export.csv'))),
+                  ('exportTXT', hurdatExport.exportColumnsToTXT, (columns, txtName)),
+                  ('filterData', __filter, (txtName, {'cat':['H3','H4','H5']})),
+                  ('avgScalar', __scalarAverages, (columns,)),
+                  ('avgBatch', batchAvg.avgStorms, (columns,)),
+                  ('sweepScalar', __scalarSweep, (columns, sweep)),
+                  ('sweepBatch', batchAvg.sweepNumMeas, (columns, sweep)),
+                  ('pipeline', __pipeline, (filename, outDir))]
+        for ext in sorted(fileIO.compressors):
+            stages.append(('parse' + ext, __parse, (__compress(filename, ext),)))
+            stages.append(('exportCSV' + ext, hurdatExport.exportColumnsToCSV,
+                           (columns, os.path.join(outDir, 'HURDAT_Export.csv' + ext))))
+        for name, function, args in stages:
+            best = None
+            for n in range(repeat):
+                if name != 'filterData':
+                    __clear(outDir)
+                seconds, result = timeCall(function, *args)
+                if best is None or seconds < best:
+                    best = seconds
+            results.append({'stage':name, 'scale':scale, 'bytes':size,
+                            'observations':len(columns['lat']),
+                            'seconds':best, 'MBps':size / 1e6 / best})
+            print('{0:14} x{1:<6} {2:8.3f} s {3:8.1f} MB/s'.format(
+                name, scale, best, size / 1e6 / best))
+    return results
+
+def saveResults(results, filename):
+    '''Saves results of runBenchmarks() as JSON with the commit and platform.'''
+    report = {'commit':__commit(), 'python':platform.python_version(),
+              'platform':platform.platform(),
+              'date':time.strftime('%Y-%m-%dT%H:%M:%S'), 'results':results}
+    f = open(filename, 'w')
+    json.dump(report, f, indent=1)
+    f.close()
+
+def compare(oldFile, newFile):
+    '''Prints the change in time of every stage between two saved reports.'''
+    reports = []
+    for filename in (oldFile, newFile):
+        f = open(filename)
+        reports.append(json.load(f))
+        f.close()
+    old = dict(((r['stage'], r['scale']), r['seconds']) for r in reports[0]['results'])
+    print('{0:14} {1:>7} {2:>10} {3:>10} {4:>7}'.format('stage', 'scale', reports[0]['commit'],
+                                                       reports[1]['commit'], 'ratio'))
+    for r in reports[1]['results']:
+        key = (r['stage'], r['scale'])
+        if key in old:
+            print('{0:14} {1:>7} {2:10.3f} {3:10.3f} {4:7.2f}'.format(
+                r['stage'], r['scale'], old[key], r['seconds'], r['seconds'] / old[key]))
+
+def test():
+    '''Test function.'''
+    print('---Module benchmark test---')
+    results = runBenchmarks([0.05])
+    if len(results) != 9 + 2 * len(fileIO.compressors):
+        print('!!!---TEST FAIL---!!!')
+    else:
+        print('PASS')
+
+    print('***workDir Test***')
+    workDir = tempfile.mkdtemp()
+    keep = os.path.join(workDir, 'keep.txt')
+    open(keep, 'w').close()
+    runBenchmarks([0.01], workDir=workDir)
+    if not os.path.exists(keep):
+        print('!!!---TEST FAIL---!!!')
+        print('runBenchmarks() removed the given workDir')
+    else:
+        print('PASS')
+    shutil.rmtree(workDir)
+
+# Run as a program
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    if args[:1] == ['--compare']:
+        compare(args[1], args[2])
+    else:
+        output = 'benchmark.json'
+        if '--output' in args:
+            output = args[args.index('--output') + 1]
+            del args[args.index('--output'):args.index('--output') + 2]
+        scales = [float(arg) for arg in args] or [1, 10]
+        saveResults(runBenchmarks(scales), output)
+        print('Results saved to', output)
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+'''
+Module for exporting data from a HURDAT data file to a binary columnar file.
+
+The file holds a header (magic, number of observations and storms) followed
+by fixed width little endian columns, each starting on an 8 byte boundary:
+
+observations: id int32, time int64 (seconds since 1970-01-01 UTC), lat and
+lon int16 (tenths of a degree, west longitudes negative), wind and pressure
+int16 (-999 for no pressure), stage, category and landfall uint8 codes
+storms: stormID int32, stormYear int16, stormLandfall uint8, stormStart int32
+(index of the first observation of each storm followed by the total) and
+11 byte ASCII names
+
+readBinary() memory maps the file and returns the columns as memoryviews
+over the map, so opening a file costs the same at any size.
+
+Import and call methods.
+
+@author: David Stack
+'''
+
+__all__ = ['exportToBinary', 'exportColumnsToBinary', 'readBinary',
+           'categories', 'test']
+
+import os, mmap, struct, calendar, fileIO, columnFile, classifier, derivedFields
+import hurdatReader as hr
+
+magic = b'HURDATB1'
+header = struct.Struct('<8sII')
+obsColumns = (('id', 'i'), ('time', 'q'), ('lat', 'h'), ('lon', 'h'),
+              ('wind', 'h'), ('pressure', 'h'), ('stage', 'B'),
+              ('category', 'B'), ('landfall', 'B'))
+stormColumns = (('stormID', 'i'), ('stormYear', 'h'), ('stormLandfall', 'B'))
+
+# Category codes of the category column (stage codes are the character
+# codes of the stage, see hurdatReader.stageNames)
+categories = classifier.categories
+
+def exportToBinary(hurdatData, filename):
+    '''Reads HURDAT data file and saves it as a binary columnar file.'''
+    exportColumnsToBinary(hr.readColumns(hurdatData), filename)
+
+def __binaryColumns(columns):
+    '''Returns the columns of the binary file from hurdatReader.readColumns().'''
+    derived = derivedFields.derive(columns)
+    return {'id':columns['id'], 'time':derived['time'], 'lat':columns['lat'],
+            'lon':derived['signedLon'], 'wind':columns['wind'],
+            'pressure':columns['pressure'], 'stage':columns['stage'],
+            'category':derived['category'], 'landfall':columns['landfall'],
+            'stormID':columns['stormID'], 'stormYear':columns['stormYear'],
+            'stormLandfall':columns['stormLandfall'], 'stormStart':columns['stormStart'],
+            'stormName':columns['stormName']}
+
+def exportColumnsToBinary(columns, filename):
+    '''Saves columns from hurdatReader.readColumns() as a binary columnar
+    file. The file is written next to its destination and renamed into
+    place, following fileIO.writePolicy if it exists (see
+    fileIO.resolveName()).'''
+    filename, reserved = fileIO.resolveName(filename)
+    if filename is None:
+        return
+    binary = __binaryColumns(columns)
+    print('Saving file...')
+    with fileIO.atomicPath(filename, reserved) as tmpName, open(tmpName, 'wb') as f:
+        f.write(header.pack(magic, len(columns['lat']), len(columns['stormID'])))
+        columnFile.writeColumns(f, binary, obsColumns, stormColumns, 'little')
+    print(filename, 'saved to', os.getcwd(), '\n')
+
+def readBinary(filename):
+    '''Memory maps a file from exportColumnsToBinary() and returns a
+    dictionary of its columns as memoryviews over the map (see the module
+    documentation for the columns) and a 'stormName' list.
+
+    Nothing is copied or decoded except the names, unless the machine is big
+    endian, in which case the columns are byte swapped copies. Raises
+    ValueError if the file is not a binary export.'''
+    with open(filename, 'rb') as f:
+        buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    view = memoryview(buf)
+    if len(view) < header.size:
+        raise ValueError(filename + ' is not a HURDAT binary file')
+    fileMagic, numObs, numStorms = header.unpack(view[:header.size])
+    if fileMagic != magic:
+        raise ValueError(filename + ' is not a HURDAT binary file')
+
+    try:
+        return columnFile.readColumns(view, header.size, obsColumns, stormColumns,
+                                      numObs, numStorms, 'little')
+    except ValueError:
+        raise ValueError(filename + ' is truncated')
+
+def test():
+    '''Test function.'''
+    print('---Module binaryExport test---')
+    import time, tempfile, shutil, fileIO
+    columns = fileIO.openColumns('HURDAT_tracks1851to2010_atl_2011rev.txt',
+                                 os.path.join('..', 'data'))
+    workDir = tempfile.mkdtemp()
+    filename = os.path.join(workDir, 'HURDAT_Export.bin')
+    exportColumnsToBinary(columns, filename)
+
+    print('***readBinary Test***')
+    startTime = time.perf_counter()
+    binary = readBinary(filename)
+    seconds = time.perf_counter() - startTime
+    known = [185101, calendar.timegm((1851, 6, 25, 0, 0, 0)), 280, -948, 80, -999, ord('*'), 2, 1]
+    test = [binary[name][0] for name, typecode in obsColumns]
+    same = (list(binary['stormStart']) == list(columns['stormStart']) and
+            binary['stormName'] == [name[0:11] for name in columns['stormName']] and
+            len(binary['lat']) == len(columns['lat']))
+    if known != test or not same:
+        print('!!!---TEST FAIL---!!!')
+        print('Actual:', known)
+        print('Calc  :', test)
+    else:
+        print('PASS')
+    print('Opened in {0:.4f} s'.format(seconds))
+    del binary, test
+    shutil.rmtree(workDir)
+
+# Run test if module is run as a program
+if __name__ == '__main__':
+    test()
@@ -1,4 +1,4 @@
-#!/usr/bin/env python 3.2
+#!/usr/bin/env python3
 '''
 Module to classify storm type based on the Saffir-Simpson Scale.
 
@@ -7,7 +7,12 @@ Import and call methods.
 @author: David Stack
 '''
 
-__all__ = ['classify', 'test']
+__all__ = ['classify', 'categories', 'bounds', 'test']
+
+# Categories in order and the lowest wind (knots) of each after the first,
+# for lookups with bisect (see derivedFields.categoryCodes())
+categories = ('TD', 'TS', 'H1', 'H2', 'H3', 'H4', 'H5')
+bounds = (34, 64, 83, 96, 114, 136)
 
 def classify(wind):
     '''Classifies strom based on wind speed. Winds are in knots.'''
@@ -0,0 +1,348 @@
+#!/usr/bin/env python3
+'''
+Command line interface to read and analyze HURDAT data.
+
+Subcommands:
+    parse        parse a data file and print storm and observation counts
+    storm        print a summary of one storm
+    export       save csv, txt, sqlite or binary exports
+    coords       save averaged coordinates of the filtered storms
+    cache warm   build the parsed data cache of a data file
+    run          run the full pipeline of main.py
+
+Modules are only imported by the subcommands that use them and parsed data
+is loaded from the memory mapped cache (see fileIO.openColumns()), so small
+queries start quickly. Run "python cli.py <subcommand> -h" for options and
+"python cli.py test" to run the module test.
+
+@author: David Stack
+'''
+
+__all__ = ['makeParser', 'main', 'test']
+
+import os, sys, argparse
+
+baseDir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+defaultSource = os.path.join(baseDir, 'data', 'HURDAT_tracks1851to2010_atl_2011rev.txt')
+defaultOutput = os.path.join(baseDir, 'output')
+
+# Coordinate exports made by the run subcommand
+mainQueries = [('Coord_Export.txt', {}),
+               # Only category TS-H5 Storms
+               ('Coord_Export_TS-H5.txt', {'cat':['TS','H1','H2','H3','H4','H5']}),
+               # Only storms that made landfall
+               ('Coord_Export_Landfall.txt', {'landfall':1}),
+               # Only storms that made landfall and were category H3-H5
+               ('Coord_Export_Landfall_H3-H5.txt', {'landfall':1,'cat':['H3','H4','H5']})]
+
+def __openColumns(args):
+    '''Returns the columns of args.source, through the cache unless
+    args.noCache is set.'''
+    import fileIO
+    if args.noCache:
+        import hurdatReader
+        hurdatData = fileIO.openFile(args.source)
+        columns = hurdatReader.readColumns(hurdatData)
+        hurdatData.close()
+        return columns
+    return fileIO.openColumns(args.source)
+
+def __setPolicy(args):
+    '''Sets the fileIO write policy from args.policy.'''
+    import fileIO
+    fileIO.writePolicy = args.policy
+
+def __parse(args):
+    '''parse subcommand.'''
+    columns = __openColumns(args)
+    print('{0} storms, {1} observations'.format(len(columns['stormID']), len(columns['lat'])))
+
+def __storm(args):
+    '''storm subcommand.'''
+    import stormModel
+    try:
+        storm = stormModel.Storms(__openColumns(args)).byID(args.id)
+    except KeyError:
+        sys.exit('No storm with ID {0}'.format(args.id))
+    print(storm.ID, storm.name, storm.year, 'landfall' if storm.landfall else 'no landfall',
+          len(storm), 'observations', 'max wind', storm.maxWind())
+    if args.track:
+        for obs in storm:
+            print('{0} {1:2d} {2:2d} {3:2d} {4:5.1f} {5:6.1f} {6:3d} {7:4d} {8}'.format(
+                obs.year, obs.month, obs.day, obs.hour, obs.lat, obs.lon, obs.wind,
+                obs.pressure, obs.category))
+
+def __export(args):
+    '''export subcommand.'''
+    __setPolicy(args)
+    columns = __openColumns(args)
+    if args.format == 'csv':
+        import hurdatExport
+        hurdatExport.exportColumnsToCSV(columns, args.output)
+    elif args.format == 'txt':
+        import hurdatExport
+        hurdatExport.exportColumnsToTXT(columns, args.output)
+    elif args.format == 'sqlite':
+        import sqliteExport
+        sqliteExport.exportColumnsToSQLite(columns, args.output)
+    else:
+        import binaryExport
+        binaryExport.exportColumnsToBinary(columns, args.output)
+
+def __filterTerms(args):
+    '''Returns coordExport filterTerms from the filter options.'''
+    filterTerms = {}
+    if args.stage:
+        filterTerms['stage'] = args.stage
+    if args.cat:
+        filterTerms['cat'] = args.cat
+    if args.landfall is not None:
+        filterTerms['landfall'] = args.landfall
+    return filterTerms
+
+def __coords(args):
+    '''coords subcommand.'''
+    import coordExport
+    __setPolicy(args)
+    coordExport.exportManyToTXT(__openColumns(args),
+                                [(args.output, __filterTerms(args), args.search)],
+                                args.numMeas)
+
+def __cache(args):
+    '''cache warm subcommand.'''
+    import fileIO
+    columns = fileIO.openColumns(args.source)
+    print('Cache of', args.source, 'holds', len(columns['stormID']), 'storms')
+
+def __columnExports(args):
+    '''Returns (stage, export function, filename) of the sqlite and binary
+    exports asked for by args.'''
+    exports = []
+    if args.sqlite:
+        import sqliteExport
+        exports.append(('exportSQLite', sqliteExport.exportColumnsToSQLite,
+                        'HURDAT_Export.sqlite'))
+    if args.binary:
+        import binaryExport
+        exports.append(('exportBinary', binaryExport.exportColumnsToBinary,
+                        'HURDAT_Export.bin'))
+    return exports
+
+def __readColumns(args, run):
+    '''Returns the columns of args.source for the run subcommand.'''
+    import fileIO
+    with run.stage('read'):
+        if args.noCache:
+            columns = __openColumns(args)
+        else:
+            columns = fileIO.openColumns(args.source, profiler=run)
+    run.count('observationsRead', len(columns['lat']))
+    return columns
+
+def __run(args):
+    '''run subcommand (the main.py pipeline).
+
+    With --incremental the csv, txt and coordinate exports are updated from
+    the manifest. The sqlite and binary exports cannot be updated per storm,
+    so they are rebuilt from the parsed (usually cached) columns.'''
+    import profiler
+    __setPolicy(args)
+    run = profiler.Profiler(args.profile or args.report is not None, args.profileStage)
+    output = args.outputDir
+    queries = [(os.path.join(output, name), terms) for name, terms in mainQueries]
+
+    def outputBytes(filename):
+        if run.enabled:
+            run.count('bytesWritten', os.path.getsize(filename))
+
+    def saveExports(columns, exports):
+        for stage, export, name in exports:
+            with run.stage(stage):
+                export(columns, os.path.join(output, name))
+            if name.endswith('.csv') or name.endswith('.txt'):
+                run.count('observationsWritten', len(columns['lat']))
+            outputBytes(os.path.join(output, name))
+
+    if args.incremental:
+        import fileIO, hurdatUpdate
+        print('-----')
+        print('Updating HURDAT exports...')
+        print('-----')
+        txtName = None
+        if not args.noText:
+            txtName = os.path.join(output, 'HURDAT_Export.txt')
+        with run.stage('update'):
+            hurdatData = fileIO.openFile(args.source)
+            numChanged, numStorms = hurdatUpdate.update(
+                hurdatData, args.manifest or os.path.join(output, 'manifest.json'),
+                os.path.join(output, 'HURDAT_Export.csv'), txtName, queries)
+            hurdatData.close()
+        run.count('stormsAveraged', numChanged)
+        exports = __columnExports(args)
+        if exports:
+            saveExports(__readColumns(args, run), exports)
+    else:
+        import hurdatExport, coordExport
+        print('-----')
+        print('Reading HURDAT data...')
+        print('-----')
+        columns = __readColumns(args, run)
+        numObs = len(columns['lat'])
+        exports = [('exportCSV', hurdatExport.exportColumnsToCSV, 'HURDAT_Export.csv')]
+        if not args.noText:
+            exports.append(('exportTXT', hurdatExport.exportColumnsToTXT, 'HURDAT_Export.txt'))
+        saveExports(columns, exports + __columnExports(args))
+
+        # Average coordinates with all observations and using filters (one pass)
+        print('-----')
+        print('Saving average coordinates data...')
+        print('-----')
+        with run.stage('coordExport'):
+            counts = coordExport.exportManyToTXT(columns, queries)
+        for query, (kept, numStorms) in zip(queries, counts):
+            run.count('recordsFiltered', numObs - kept)
+            run.count('stormsAveraged', numStorms)
+            outputBytes(query[0])
+
+    print('-----')
+    print('All files successfully created.')
+    print('-----')
+    run.printReport()
+    if args.report is not None:
+        run.saveReport(args.report)
+
+def makeParser():
+    '''Returns the argparse parser of the command line interface.'''
+    parser = argparse.ArgumentParser(prog='hurdatReader',
+                                     description='Read and analyze HURDAT data.')
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('-s', '--source', default=defaultSource,
+                        help='HURDAT data file, may be .gz/.bz2/.xz (default: %(default)s)')
+    common.add_argument('--no-cache', dest='noCache', action='store_true',
+                        help='parse the data file instead of using the cache')
+    writer = argparse.ArgumentParser(add_help=False)
+    writer.add_argument('--policy', default='overwrite',
+                        choices=['overwrite', 'skip', 'version', 'prompt'],
+                        help='what to do with existing output files of every format '
+                             '(default: %(default)s)')
+    commands = parser.add_subparsers(dest='command', metavar='command')
+    commands.required = True
+
+    command = commands.add_parser('parse', parents=[common], help='print storm and observation counts')
+    command.set_defaults(function=__parse)
+
+    command = commands.add_parser('storm', parents=[common], help='print a summary of one storm')
+    command.add_argument('id', type=int, help='storm ID, e.g. 185101')
+    command.add_argument('--track', action='store_true', help='also print every fix')
+    command.set_defaults(function=__storm)
+
+    command = commands.add_parser('export', parents=[common, writer], help='save an export')
+    command.add_argument('format', choices=['csv', 'txt', 'sqlite', 'binary'])
+    command.add_argument('-o', '--output', required=True, help='output file')
+    command.set_defaults(function=__export)
+
+    command = commands.add_parser('coords', parents=[common, writer],
+                                  help='save averaged coordinates of filtered storms')
+    command.add_argument('-o', '--output', required=True, help='output file')
+    command.add_argument('--stage', nargs='+', help="stage names, e.g. 'Tropical Cyclone'")
+    command.add_argument('--cat', nargs='+', help='categories, e.g. H3 H4 H5')
+    command.add_argument('--landfall', type=int, choices=[0, 1])
+    command.add_argument('--search', default='and', choices=['and', 'or'])
+    command.add_argument('--num-meas', dest='numMeas', type=int, default=4,
+                         help='measurements per average (default: %(default)s)')
+    command.set_defaults(function=__coords)
+
+    command = commands.add_parser('cache', parents=[common], help='manage the parsed data cache')
+    command.add_argument('action', choices=['warm'])
+    command.set_defaults(function=__cache)
+
+    command = commands.add_parser('run', parents=[common, writer], help='run the full pipeline')
+    command.add_argument('-o', '--output-dir', dest='outputDir', default=defaultOutput,
+                         help='output folder (default: %(default)s)')
+    command.add_argument('--no-text', dest='noText', action='store_true',
+                         help='skip HURDAT_Export.txt')
+    command.add_argument('--sqlite', action='store_true', help='also save HURDAT_Export.sqlite')
+    command.add_argument('--binary', action='store_true', help='also save HURDAT_Export.bin')
+    command.add_argument('--incremental', action='store_true',
+                         help='only reprocess storms changed since the last run')
+    command.add_argument('--manifest', help='manifest of --incremental runs')
+    command.add_argument('--profile', action='store_true', help='print stage times and counters')
+    command.add_argument('--profile-stage', dest='profileStage', action='append', default=[],
+                         help='also run a stage under cProfile (repeatable)')
+    command.add_argument('--report', help='save the profile report as JSON')
+    command.set_defaults(function=__run)
+    return parser
+
+def main(argv=None):
+    '''Runs the command line interface with argv (default sys.argv[1:]).'''
+    args = makeParser().parse_args(argv)
+    args.function(args)
+
+def test():
+    '''Test function.'''
+    print('---Module cli test---')
+    import time, subprocess, tempfile, shutil
+    workDir = tempfile.mkdtemp()
+
+    print('***Cold start Test***')
+    command = [sys.executable, os.path.abspath(__file__), 'storm', '185101']
+    subprocess.check_output(command) # Builds the cache if needed
+    startTime = time.perf_counter()
+    output = subprocess.check_output(command).decode()
+    seconds = time.perf_counter() - startTime
+    if not output.startswith('185101 NOT NAMED') or seconds >= 1.0:
+        print('!!!---TEST FAIL---!!!')
+        print('Calc  :', output)
+    else:
+        print('PASS')
+    print('Cold start: {0:.3f} s'.format(seconds))
+
+    print('***coords Test***')
+    filename = os.path.join(workDir, 'coords.txt')
+    subprocess.check_output([sys.executable, os.path.abspath(__file__), 'coords', '-o', filename,
+                             '--cat', 'H3', 'H4', 'H5', '--landfall', '1'])
+    f = open(filename)
+    lines = f.read().split('\n')
+    f.close()
+    f = open(os.path.join(defaultOutput, 'Coord_Export_Landfall_H3-H5.txt'))
+    known = f.read().split('\n')
+    f.close()
+    if lines != known:
+        print('!!!---TEST FAIL---!!!')
+        print('Actual:', len(known), 'lines')
+        print('Calc  :', len(lines), 'lines')
+    else:
+        print('PASS')
+
+    print('***export --policy Test***')
+    filename = os.path.join(workDir, 'export.sqlite')
+    command = [sys.executable, os.path.abspath(__file__), 'export', 'sqlite', '-o', filename]
+    subprocess.check_output(command)
+    mtime = os.stat(filename).st_mtime_ns
+    subprocess.check_output(command + ['--policy', 'skip'])
+    subprocess.check_output(command + ['--policy', 'version'])
+    if (os.stat(filename).st_mtime_ns != mtime or
+            not os.path.isfile(os.path.join(workDir, 'export_1.sqlite'))):
+        print('!!!---TEST FAIL---!!!')
+        print('Calc  :', os.listdir(workDir))
+    else:
+        print('PASS')
+
+    print('***run --incremental Test***')
+    runDir = os.path.join(workDir, 'run')
+    os.mkdir(runDir)
+    main(['run', '-o', runDir, '--incremental', '--sqlite', '--binary', '--no-text'])
+    names = sorted(os.listdir(runDir))
+    if 'HURDAT_Export.sqlite' not in names or 'HURDAT_Export.bin' not in names:
+        print('!!!---TEST FAIL---!!!')
+        print('Calc  :', names)
+    else:
+        print('PASS')
+    shutil.rmtree(workDir)
+
+# Run as a program
+if __name__ == '__main__':
+    if sys.argv[1:] == ['test']:
+        test()
+    else:
+        main()
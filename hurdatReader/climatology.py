@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+'''
+Module for gridding track points into track density and intensity maps.
+
+Every track point of the columns returned by hurdatReader.readColumns() is
+binned into a global lat/lon grid of cellSize degrees (cells start at 90S
+and 180W, longitudes signed as in HURDAT_Export.csv). Each cell gets the
+number of points, the number of different storms, the highest wind and the
+mean pressure (of the points with a pressure). Points can be filtered with
+the coordExport filter terms (see stormQuery.StormQuery). Grids of each
+decade can be made in a process pool and saved as csv or binary files.
+
+Import and call methods.
+
+@author: David Stack
+'''
+
+__all__ = ['makeGrid', 'meanPressure', 'gridByDecade', 'saveCSV', 'saveBinary',
+           'readBinary', 'test']
+
+import os, sys, math, struct, multiprocessing
+from array import array
+import fileIO, derivedFields, stormQuery
+
+gridHeader = struct.Struct('<8sIIi')
+gridMagic = b'HURDATG1'
+csvHeader = 'lat, lon, count, storms, maxWind, meanPressure'
+
+def __newGrid(cellTenths):
+    '''Returns an empty grid of cells cellTenths tenths of a degree wide.'''
+    rows = -(-1800 // cellTenths)
+    cols = -(-3600 // cellTenths)
+    return {'cellTenths':cellTenths, 'rows':rows, 'cols':cols,
+            'count':array('i', bytes(4 * rows * cols)),
+            'storms':array('i', bytes(4 * rows * cols)),
+            'maxWind':array('h', bytes(2 * rows * cols)),
+            'pressureSum':array('d', bytes(8 * rows * cols)),
+            'pressureCount':array('i', bytes(4 * rows * cols))}
+
+def __cells(grid, columns, indexList):
+    '''Returns the grid cell of every observation in indexList.'''
+    cellTenths = grid['cellTenths']
+    lastRow = grid['rows'] - 1
+    lastCol = grid['cols'] - 1
+    cols = grid['cols']
+    rows = {}
+    colsOf = {}
+    lats = columns['lat']
+    lons = derivedFields.signedLons(columns['lon'][i] for i in indexList)
+    cells = array('i')
+    for k in range(len(indexList)):
+        lat = lats[indexList[k]]
+        if lat not in rows:
+            rows[lat] = min((lat + 900) // cellTenths, lastRow) * cols
+        lon = lons[k]
+        if lon not in colsOf:
+            colsOf[lon] = min((lon + 1800) // cellTenths, lastCol)
+        cells.append(rows[lat] + colsOf[lon])
+    return cells
+
+def makeGrid(columns, cellSize=1.0, filterTerms={}, searchType='and', query=None,
+             decade=None):
+    '''Returns the grid of the track points of columns from
+    hurdatReader.readColumns() that pass filterTerms, optionally only of one
+    decade (e.g. 1990).
+
+    The grid is a dictionary with 'rows', 'cols', 'cellTenths' and arrays
+    (row major, row 0 at 90S, column 0 at 180W) 'count', 'storms',
+    'maxWind', 'pressureSum' and 'pressureCount'; see meanPressure(). query
+    is an optional stormQuery.StormQuery of columns to reuse.'''
+    if filterTerms or decade is not None:
+        if query is None:
+            query = stormQuery.StormQuery(columns)
+        bitmap = query.select(filterTerms, searchType)
+        if decade is not None:
+            bitmap &= query.select({'decade':decade})
+        indexList = query.indices(bitmap)
+    else:
+        indexList = range(len(columns['lat']))
+    return __gridIndices(columns, cellSize, indexList)
+
+def __gridIndices(columns, cellSize, indexList):
+    '''Returns the grid of the observations in indexList (see makeGrid()).'''
+    grid = __newGrid(int(round(cellSize * 10)))
+    cells = __cells(grid, columns, indexList)
+    counts = grid['count']
+    storms = grid['storms']
+    maxWinds = grid['maxWind']
+    pressureSums = grid['pressureSum']
+    pressureCounts = grid['pressureCount']
+    IDs = columns['id']
+    winds = columns['wind']
+    pressures = columns['pressure']
+    prevID = None
+    visited = set()
+    for k in range(len(indexList)):
+        i = indexList[k]
+        cell = cells[k]
+        counts[cell] += 1
+        if IDs[i] != prevID:
+            visited = set()
+            prevID = IDs[i]
+        if cell not in visited:
+            visited.add(cell)
+            storms[cell] += 1
+        if winds[i] > maxWinds[cell]:
+            maxWinds[cell] = winds[i]
+        if pressures[i] != -999:
+            pressureSums[cell] += pressures[i]
+            pressureCounts[cell] += 1
+    return grid
+
+def meanPressure(grid, cell):
+    '''Returns the mean pressure of a cell or NaN if it has none.'''
+    if grid['pressureCount'][cell]:
+        return grid['pressureSum'][cell] / grid['pressureCount'][cell]
+    return float('nan')
+
+def __gridDecade(task):
+    '''Process pool worker for gridByDecade(). Grids the observation indices
+    of one decade, using the memory mapped cache for the columns.'''
+    filename, root, decade, cellSize, indexList = task
+    columns = fileIO.openColumns(filename, root)
+    return decade, __gridIndices(columns, cellSize, indexList)
+
+def gridByDecade(filename, root='', cellSize=1.0, filterTerms={}, searchType='and',
+                 processes=None):
+    '''Returns a dictionary of makeGrid() of each decade of a HURDAT data
+    file that has observations passing filterTerms, made in a process pool.
+
+    The filter is applied once here and the observations passing it are
+    split by decade in one pass, so each worker only grids its own indices.
+    Workers map the columns from the fileIO.openColumns() cache, which is
+    built first if needed. Call from under "if __name__ == '__main__':" on
+    platforms that spawn new processes.'''
+    columns = fileIO.openColumns(filename, root)
+    if filterTerms:
+        query = stormQuery.StormQuery(columns)
+        indexList = query.indices(query.select(filterTerms, searchType))
+    else:
+        indexList = range(len(columns['lat']))
+    years = columns['year']
+    decadeIndices = {}
+    for i in indexList:
+        decade = years[i] // 10 * 10
+        if decade not in decadeIndices:
+            decadeIndices[decade] = array('i')
+        decadeIndices[decade].append(i)
+    tasks = [(filename, root, decade, cellSize, decadeIndices[decade])
+             for decade in sorted(decadeIndices)]
+    if processes is None:
+        processes = multiprocessing.cpu_count()
+    pool = multiprocessing.Pool(processes)
+    try:
+        return dict(pool.map(__gridDecade, tasks))
+    finally:
+        pool.close()
+        pool.join()
+
+def saveCSV(grid, filename):
+    '''Saves the cells of grid with at least one point as a csv file with
+    the lat and lon of the south west corner of each cell.'''
+    cols = grid['cols']
+    cellTenths = grid['cellTenths']
+    rows = []
+    for cell in range(len(grid['count'])):
+        if grid['count'][cell]:
+            rows.append('\n{0}, {1}, {2}, {3}, {4}, {5:.1f}'.format(
+                (cell // cols * cellTenths - 900) / 10, (cell % cols * cellTenths - 1800) / 10,
+                grid['count'][cell], grid['storms'][cell], grid['maxWind'][cell],
+                meanPressure(grid, cell)))
+    with fileIO.makeTextFile(filename) as csvExport:
+        csvExport.write(csvHeader)
+        csvExport.write(''.join(rows))
+    print(csvExport.name, 'saved to', os.getcwd(), '\n')
+
+def saveBinary(grid, filename):
+    '''Saves grid as a binary file: a header (magic, rows, cols, cell size in
+    tenths) and little endian count, storms (int32), maxWind (int16) and
+    meanPressure (float32, NaN for none) arrays. An existing file is handled
+    as fileIO.writePolicy says (see fileIO.resolveName()).'''
+    filename, reserved = fileIO.resolveName(filename)
+    if filename is None:
+        return
+    means = array('f', [meanPressure(grid, cell) for cell in range(len(grid['count']))])
+    with fileIO.atomicPath(filename, reserved) as tmpName, open(tmpName, 'wb') as f:
+        f.write(gridHeader.pack(gridMagic, grid['rows'], grid['cols'], grid['cellTenths']))
+        for values in (grid['count'], grid['storms'], grid['maxWind'], means):
+            values = array(values.typecode, values)
+            if sys.byteorder != 'little':
+                values.byteswap()
+            f.write(values.tobytes())
+    print(filename, 'saved to', os.getcwd(), '\n')
+
+def readBinary(filename):
+    '''Returns a dictionary with 'rows', 'cols', 'cellTenths' and the
+    'count', 'storms', 'maxWind' and 'meanPressure' arrays of a file from
+    saveBinary().'''
+    with open(filename, 'rb') as f:
+        data = f.read()
+    fileMagic, rows, cols, cellTenths = gridHeader.unpack(data[:gridHeader.size])
+    if fileMagic != gridMagic:
+        raise ValueError(filename + ' is not a HURDAT grid file')
+    grid = {'rows':rows, 'cols':cols, 'cellTenths':cellTenths}
+    offset = gridHeader.size
+    for name, typecode in (('count', 'i'), ('storms', 'i'), ('maxWind', 'h'),
+                           ('meanPressure', 'f')):
+        values = array(typecode)
+        size = rows * cols * values.itemsize
+        values.frombytes(data[offset:offset + size])
+        if sys.byteorder != 'little':
+            values.byteswap()
+        grid[name] = values
+        offset += size
+    return grid
+
+def test():
+    '''Test function.'''
+    print('---Module climatology test---')
+    import time, tempfile, shutil
+    filename = 'HURDAT_tracks1851to2010_atl_2011rev.txt'
+    root = os.path.join('..', 'data')
+    columns = fileIO.openColumns(filename, root)
+
+    print('***makeGrid Test***')
+    filterTerms = {'cat':['H3','H4','H5']}
+    grid = makeGrid(columns, 2.5, filterTerms)
+    query = stormQuery.StormQuery(columns)
+    indexList = query.indices(query.select(filterTerms))
+    stormCells = set()
+    for i in indexList:
+        lat = columns['lat'][i] / 10
+        lon = derivedFields.signedLon(columns['lon'][i]) / 10
+        stormCells.add((columns['id'][i], math.floor((lat + 90) / 2.5), math.floor((lon + 180) / 2.5)))
+    known = (len(indexList), len(stormCells), max(columns['wind'][i] for i in indexList))
+    test = (sum(grid['count']), sum(grid['storms']), max(grid['maxWind']))
+    if known != test:
+        print('!!!---TEST FAIL---!!!')
+        print('Actual:', known)
+        print('Calc  :', test)
+    else:
+        print('PASS')
+
+    print('***gridByDecade Test***')
+    startTime = time.perf_counter()
+    grids = gridByDecade(filename, root, 2.5, filterTerms)
+    seconds = time.perf_counter() - startTime
+    test = [sum(grids[decade]['count'][cell] for decade in grids)
+            for cell in range(len(grid['count']))]
+    if test != list(grid['count']):
+        print('!!!---TEST FAIL---!!!')
+        print('Decade counts do not add up to the full grid')
+    else:
+        print('PASS')
+    print('{0} decades in {1:.2f} s'.format(len(grids), seconds))
+
+    print('***saveBinary/readBinary Test***')
+    workDir = tempfile.mkdtemp()
+    saveCSV(grid, os.path.join(workDir, 'grid.csv'))
+    saveBinary(grid, os.path.join(workDir, 'grid.bin'))
+    loaded = readBinary(os.path.join(workDir, 'grid.bin'))
+    if list(loaded['count']) != list(grid['count']) or list(loaded['maxWind']) != list(grid['maxWind']):
+        print('!!!---TEST FAIL---!!!')
+    else:
+        print('PASS')
+    shutil.rmtree(workDir)
+
+# Run test if module is run as a program
+if __name__ == '__main__':
+    test()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+'''
+Module for the column layout shared by the binary files of parsed HURDAT data.
+
+After its own header a file holds observation columns, storm columns and
+stormStart (index of the first observation of each storm followed by the
+total), each starting on an 8 byte boundary, followed by the storm names as
+nameLength byte ASCII strings. hurdatCache writes the columns in the native
+byte order and binaryExport in little endian.
+
+Import and call methods.
+
+@author: David Stack
+'''
+
+__all__ = ['nameLength', 'pad', 'writeColumns', 'readColumns', 'test']
+
+import sys, struct
+from array import array
+
+nameLength = 11
+
+def pad(offset):
+    '''Returns offset rounded up to the next multiple of 8.'''
+    return (offset + 7) & ~7
+
+def __layout(obsColumns, stormColumns, numObs, numStorms):
+    '''Returns (name, typecode, count) of every column in file order.'''
+    return ([(name, typecode, numObs) for name, typecode in obsColumns] +
+            [(name, typecode, numStorms) for name, typecode in stormColumns] +
+            [('stormStart', 'i', numStorms + 1)])
+
+def writeColumns(f, columns, obsColumns, stormColumns, byteorder=None):
+    '''Writes the columns named in obsColumns and stormColumns ((name,
+    typecode) tuples), columns['stormStart'] and columns['stormName'] to the
+    binary file f after its header. byteorder is 'little' or 'big' (default
+    is the native order).'''
+    if byteorder is None:
+        byteorder = sys.byteorder
+    layout = __layout(obsColumns, stormColumns, 0, 0)
+    for name, typecode, count in layout:
+        f.write(b'\0' * (pad(f.tell()) - f.tell()))
+        values = array(typecode, columns[name])
+        if byteorder != sys.byteorder:
+            values.byteswap()
+        f.write(values.tobytes())
+    f.write(b''.join(name.encode('ascii').ljust(nameLength)[:nameLength]
+                     for name in columns['stormName']))
+
+def readColumns(view, offset, obsColumns, stormColumns, numObs, numStorms, byteorder=None):
+    '''Returns the columns of a file written by writeColumns() from a
+    memoryview of the file, starting after its header at offset.
+
+    Columns are memoryviews over view (byte swapped copies if byteorder is
+    not the native order) and 'stormName' is a list. Raises ValueError if
+    the view is too short.'''
+    if byteorder is None:
+        byteorder = sys.byteorder
+    columns = {}
+    for name, typecode, count in __layout(obsColumns, stormColumns, numObs, numStorms):
+        offset = pad(offset)
+        end = offset + count * struct.calcsize(typecode)
+        if end > len(view):
+            raise ValueError('column file is truncated')
+        columns[name] = view[offset:end].cast(typecode)
+        if byteorder != sys.byteorder:
+            swapped = array(typecode, columns[name])
+            swapped.byteswap()
+            columns[name] = memoryview(swapped)
+        offset = end
+    end = offset + numStorms * nameLength
+    if end > len(view):
+        raise ValueError('column file is truncated')
+    names = view[offset:end].tobytes().decode('ascii')
+    columns['stormName'] = [names[i:i + nameLength]
+                            for i in range(0, len(names), nameLength)]
+    return columns
+
+def test():
+    '''Test function.'''
+    print('---Module columnFile test---')
+    import io
+    columns = {'id':[1, 1, 2], 'wind':[30, 45, 50], 'stormID':[1, 2],
+               'stormStart':[0, 2, 3], 'stormName':['ABLE       ', 'BAKER      ']}
+    obsColumns = (('id', 'i'), ('wind', 'h'))
+    stormColumns = (('stormID', 'i'),)
+
+    print('***writeColumns/readColumns Test***')
+    same = True
+    for byteorder in ('little', 'big'):
+        f = io.BytesIO()
+        f.write(b'head')
+        writeColumns(f, columns, obsColumns, stormColumns, byteorder)
+        view = memoryview(f.getvalue())
+        test = readColumns(view, 4, obsColumns, stormColumns, 3, 2, byteorder)
+        same = same and all(list(test[name]) == list(columns[name]) for name in columns)
+        try:
+            readColumns(view[:-1], 4, obsColumns, stormColumns, 3, 2, byteorder)
+            same = False
+        except ValueError:
+            pass
+    if not same:
+        print('!!!---TEST FAIL---!!!')
+        print('Calc  :', test)
+    else:
+        print('PASS')
+
+# Run test if module is run as a program
+if __name__ == '__main__':
+    test()
@@ -1,4 +1,4 @@
-#!/usr/bin/env python 3.2
+#!/usr/bin/env python3
 '''Module for averaging GPS coordinates together based on spherical shape
     of the Earth or summing the area found through integration.
 
@@ -10,7 +10,9 @@ Import and call methods.
 import math
 
 __all__ = ['avgAll', 'avgMid', 'avgFirst', 'avgLast', 'calcScale',
-           'weightedAvgCoords', 'test']
+           'weightedAvgCoords', 'toCartesian', 'earthRadius', 'test']
+
+earthRadius = 6371.0 # Mean radius of the Earth in km
 
 def __mean(nums):
     '''Calculates average of a list.'''
@@ -28,6 +30,10 @@ def __toCartesian(lat, lon):
     cartCoords = [x,y,z]
     return cartCoords
 
+def toCartesian(lat, lon):
+    '''Returns [x, y, z] unit vector of a lat/lon point given in degrees.'''
+    return __toCartesian(lat, lon)
+
 def __avgCoords(latList, lonList):
     '''Calculates cartesian coordinates from lat lon using geographic midpoint.
     Returns lat/lon coords in degrees.'''
@@ -1,4 +1,4 @@
-#!/usr/bin/env python 3.2
+#!/usr/bin/env python3
 '''Module for exporting averaged GPS coordinates to a text file.
 
 Import and call methods.
@@ -6,9 +6,14 @@ Import and call methods.
 @author: David Stack
 '''
 
-import os, fileIO, coordAvg
+import os, io, itertools, contextlib, fileIO, coordAvg, batchAvg, classifier
+import hurdatReader as hr
 
-__all__ = ['exportToTXT', 'getScaleList', 'test']
+__all__ = ['exportToTXT', 'exportColumnsToTXT', 'exportManyToTXT',
+           'exportStreamToTXT', 'formatManyTXT', 'iterStorms', 'getScaleList',
+           'test']
+
+coordHeader = 'ID     dec  year mo dy hr name       allLat     allLon     midLat     midLon     firstLat   firstLon   lastLat    lastLon'
 
 scaleList = []
 
@@ -71,38 +76,88 @@ def __getLandfall(line):
     landfall = int(line[74])
     return landfall
 
+def __keep(stage, cat, landfall, filterTerms, searchType):
+    '''Returns True if a record with stage, cat and landfall passes filterTerms.
+
+    With searchType 'or' only the terms given in filterTerms are considered.'''
+    passList = []
+    if 'stage' in filterTerms:
+        passList.append(stage in filterTerms['stage'])
+    if 'cat' in filterTerms:
+        passList.append(cat in filterTerms['cat'])
+    if 'landfall' in filterTerms:
+        passList.append(landfall == filterTerms['landfall'])
+    if not passList:
+        return True
+    if searchType == 'and':
+        return all(passList)
+    else:
+        return any(passList)
+
+def __iterData(dataFile, filterTerms, searchType='and'):
+    '''Yields the lines of dataFile that pass filterTerms. See __filterData().'''
+    for line in dataFile:
+        if filterTerms == {} or __keep(__getStage(line).strip(), __getCat(line).strip(),
+                                       __getLandfall(line), filterTerms, searchType):
+            yield line
+
 def __filterData(dataFile, filterTerms, searchType='and'):
     '''Filters data based on filterTerms and optional searchType ('and' or 'or').
 
     These filterTerms can include 'stage', 'cat', and 'landfall' and must be in the
     dictionary format ({key:value}). For 'stage' and 'cat' multiple entries can be entered
-    as a list. 'landfall' must be entered as an integer. The searchType can either be 'and' or 'or'.'''
-    newData = []
-    dataFile.readline() # Reads headers
-    
-    for line in dataFile:
-        addCat = True
-        addLandfall = True
-        addStage = True
-        if 'stage' in filterTerms:
-            stageList = filterTerms['stage']
-            if __getStage(line).strip() not in stageList:
-                addStage = False
-        if 'cat' in filterTerms:
-            catList = filterTerms['cat']
-            if __getCat(line).strip() not in catList:
-                addCat = False
-        if 'landfall' in filterTerms:
-            landfall = filterTerms['landfall']
-            if __getLandfall(line) != landfall:
-                addLandfall = False
-        if searchType == 'and':
-            if addStage and addCat and addLandfall:
-                newData.append(line)
-        else:
-            if addStage or addCat or addLandfall:
-                newData.append(line)
-    return newData
+    as a list. 'landfall' must be entered as an integer. The searchType can either be 'and' or 'or'.
+    The headers of dataFile must already have been read.'''
+    return list(__iterData(dataFile, filterTerms, searchType))
+
+def iterStorms(hurdatExport, filterTerms={}, searchType='and'):
+    '''Yields (start, latList, lonList, windList) for each storm in
+    hurdatExport.txt as soon as its last line is read.
+
+    start holds the ID, decade, startYear, startMonth, startDay, startHour and
+    name strings of the storm. Lines are optionally filtered (see
+    __filterData()) and consecutive lines with the same ID form a storm, so
+    only one storm is held in memory. The headers must already have been read.'''
+    for ID, lines in itertools.groupby(__iterData(hurdatExport, filterTerms, searchType), __getID):
+        line = next(lines)
+        startYear = __getYear(line)
+        start = (ID, startYear[0:3] + '0', startYear, __getMonth(line),
+                 __getDay(line), __getHour(line), __getName(line))
+        latList = [__getLat(line)]
+        lonList = [__getLon(line)]
+        windList = [__getWind(line)]
+        for line in lines:
+            latList.append(__getLat(line))
+            lonList.append(__getLon(line))
+            windList.append(__getWind(line))
+        yield start, latList, lonList, windList
+
+def __makeTextFile(filename):
+    '''Opens coordinate export file for write and writes headers.'''
+    txtExport = fileIO.makeTextFile(filename)
+    txtExport.write(coordHeader)
+    print('Saving file...')
+    return txtExport
+
+def __writeLine(txtExport, start, avgAll, avgMid, avgFirst, avgLast):
+    '''Writes the averages of one storm to txtExport.
+
+    start holds the ID, decade, startYear, startMonth, startDay, startHour and
+    name strings of the storm.'''
+    txtExport.write('\n')
+    txtExport.write('{0} {1} {2} {3} {4} {5} {6} {7:10.6f} {8:10.6f} {9:10.6f} {10:10.6f} {11:10.6f} {12:10.6f} {13:10.6f} {14:10.6f}'.format(
+        start[0], start[1], start[2], start[3], start[4], start[5], start[6],
+        avgAll[0],-avgAll[1],avgMid[0],-avgMid[1],avgFirst[0],-avgFirst[1],avgLast[0],-avgLast[1]))
+
+def __writeStorm(txtExport, start, latList, lonList, windList, numMeas):
+    '''Averages coordinates of one storm and writes them to txtExport.'''
+    avgAll = coordAvg.avgAll(latList, lonList)
+    avgMid = coordAvg.avgMid(latList, lonList, windList, numMeas)
+    avgFirst = coordAvg.avgFirst(latList, lonList, numMeas)
+    avgLast = coordAvg.avgLast(latList, lonList, numMeas)
+    scale = coordAvg.calcScale(latList, lonList)
+    scaleList.append(scale)
+    __writeLine(txtExport, start, avgAll, avgMid, avgFirst, avgLast)
 
 def exportToTXT(hurdatExport, filename, filterTerms={}, numMeas=4):
     '''Loops through hurdatExport.txt and saves relevent averages.
@@ -112,63 +167,137 @@ def exportToTXT(hurdatExport, filename, filterTerms={}, numMeas=4):
     Creates file with headers: ID,decade,startYear,startMonth,startDay,
     startHour,name,avgAll,avgMid,avgFirst,avgLast.'''
     hurdatExport.readline() # Reads headers
-    txtExport = fileIO.makeTextFile(filename)
-    txtExport.write('ID     dec  year mo dy hr name       allLat     allLon     midLat     midLon     firstLat   firstLon   lastLat    lastLon')
-    print('Saving file...')
-
-    if filterTerms == {}:
-        lineList = hurdatExport.readlines()
-    else:
-        lineList = __filterData(hurdatExport,filterTerms)
-    lineList.append('')
-    for i in range(len(lineList)):
-        nextLine = lineList[i]
-        if i == 0:
-            prevID = 'null'
-            line = nextLine
-            continue
-        ID = __getID(line)
-        nextID = __getID(nextLine)
-        if ID != prevID:
-            #print(ID)
-            latList = []
-            lonList = []
-            windList = []
-            prevID = ID
-            name = __getName(line)
-            startYear = __getYear(line)
-            decade = startYear[0:3] + '0'
-            startMonth = __getMonth(line)
-            startDay = __getDay(line)
-            startHour = __getHour(line)
-            # landfall =
-
-        # store avg lat, lon, and wind
-        #print('Storing info...')
-        lat = __getLat(line)
-        lon = __getLon(line)
-        wind = __getWind(line)
-        latList.append(lat)
-        lonList.append(lon)
-        windList.append(wind)
-        
-        if ID != nextID:
-            #print('Writing...')
-            txtExport.write('\n')
-            avgAll = coordAvg.avgAll(latList, lonList)
-            avgMid = coordAvg.avgMid(latList, lonList, windList, numMeas)
-            #print('WindList:',windList)
-            avgFirst = coordAvg.avgFirst(latList, lonList, numMeas)
-            avgLast = coordAvg.avgLast(latList, lonList, numMeas)
-            scale = coordAvg.calcScale(latList, lonList)
-            scaleList.append(scale)
-            txtExport.write('{0} {1} {2} {3} {4} {5} {6} {7:10.6f} {8:10.6f} {9:10.6f} {10:10.6f} {11:10.6f} {12:10.6f} {13:10.6f} {14:10.6f}'.format(ID,decade,startYear,startMonth,startDay,startHour,name,
-			avgAll[0],-avgAll[1],avgMid[0],-avgMid[1],avgFirst[0],-avgFirst[1],avgLast[0],-avgLast[1]))
-            write = False
-        prevID = ID
-        line = nextLine
+    with __makeTextFile(filename) as txtExport:
+        for start, latList, lonList, windList in iterStorms(hurdatExport, filterTerms):
+            __writeStorm(txtExport, start, latList, lonList, windList, numMeas)
     print(txtExport.name, 'saved to', os.getcwd(), '\n')
 
+def exportColumnsToTXT(columns, filename, filterTerms={}, numMeas=4, searchType='and'):
+    '''Loops through columns from hurdatReader.readColumns() and saves relevent
+    averages without going through hurdatExport.txt.
+
+    Takes the same filterTerms, searchType and numMeas as exportToTXT() and
+    creates the same file.'''
+    exportManyToTXT(columns, [(filename, filterTerms, searchType)], numMeas)
+
+def exportManyToTXT(columns, queries, numMeas=4):
+    '''Saves relevent averages for many filters in a single pass over columns
+    from hurdatReader.readColumns().
+
+    queries is a list of (filename, filterTerms) or (filename, filterTerms,
+    searchType) tuples. See __filterData() for the filter format. Each
+    observation is checked against the queries once (observations with the
+    same stage, wind and landfall share the result) and added to every query
+    it passes, so the cost grows with the data and not with the number of
+    queries. The averages of each query are then computed in one batch (see
+    batchAvg.avgStorms()). Creates the same files as exportColumnsToTXT().
+
+    Returns a list with the number of observations kept and storms averaged
+    by each query as (observations, storms) tuples.'''
+    terms = __queryTerms(queries)
+    indexLists = __route(columns, terms, {})
+    names = dict(zip(columns['stormID'], columns['stormName']))
+    counts = []
+    for q in range(len(queries)):
+        with __makeTextFile(queries[q][0]) as txtExport:
+            numStorms = __writeQuery(txtExport, columns, indexLists[q], numMeas, names)
+        print(txtExport.name, 'saved to', os.getcwd(), '\n')
+        counts.append((len(indexLists[q]), numStorms))
+    return counts
+
+def exportStreamToTXT(hurdatData, queries, numMeas=4):
+    '''Saves relevent averages for many filters while streaming a HURDAT data
+    file one storm at a time (see hurdatReader.iterStormColumns()).
+
+    Takes the same queries as exportManyToTXT() and creates the same files,
+    but each storm is averaged and written as soon as its last line is read,
+    so memory is bounded by the longest storm and not by the file size.'''
+    terms = __queryTerms(queries)
+    routes = {}
+    # Every file is saved when the block ends, or discarded if reading fails
+    with contextlib.ExitStack() as stack:
+        files = [stack.enter_context(__makeTextFile(query[0])) for query in queries]
+        for columns in hr.iterStormColumns(hurdatData):
+            indexLists = __route(columns, terms, routes)
+            names = dict(zip(columns['stormID'], columns['stormName']))
+            for q in range(len(queries)):
+                __writeQuery(files[q], columns, indexLists[q], numMeas, names)
+    for txtExport in files:
+        print(txtExport.name, 'saved to', os.getcwd(), '\n')
+
+def formatManyTXT(columns, queries, numMeas=4, routes=None):
+    '''Returns the rows exportManyToTXT() would write for each of queries as
+    one string per query (each row starting with a newline, no headers).
+
+    routes caches the queries passed by each (stage, wind, landfall) and can
+    be shared between calls on parts of the same data file.'''
+    if routes is None:
+        routes = {}
+    indexLists = __route(columns, __queryTerms(queries), routes)
+    names = dict(zip(columns['stormID'], columns['stormName']))
+    texts = []
+    for q in range(len(queries)):
+        text = io.StringIO()
+        __writeQuery(text, columns, indexLists[q], numMeas, names)
+        texts.append(text.getvalue())
+    return texts
+
+def __queryTerms(queries):
+    '''Returns (filterTerms, searchType) of each query of exportManyToTXT().'''
+    terms = []
+    for query in queries:
+        if len(query) > 2:
+            terms.append((query[1], query[2]))
+        else:
+            terms.append((query[1], 'and'))
+    return terms
+
+def __route(columns, terms, routes):
+    '''Returns a list of the observations in columns that pass each of terms.
+
+    routes caches the queries passed by each (stage, wind, landfall).'''
+    numQueries = len(terms)
+    indexLists = [[] for q in range(numQueries)]
+    stormStart = columns['stormStart']
+    winds = columns['wind']
+    stages = columns['stage']
+    for s in range(len(columns['stormID'])):
+        landfall = columns['stormLandfall'][s]
+        for i in range(stormStart[s], stormStart[s+1]):
+            key = (stages[i], winds[i], landfall)
+            route = routes.get(key)
+            if route is None:
+                stage = chr(stages[i])
+                stage = hr.stageNames.get(stage, stage).strip()
+                cat = classifier.classify(winds[i])
+                route = tuple(q for q in range(numQueries)
+                              if __keep(stage, cat, landfall, terms[q][0], terms[q][1]))
+                routes[key] = route
+            for q in route:
+                indexLists[q].append(i)
+    return indexLists
+
+def __writeQuery(txtExport, columns, indexList, numMeas, names):
+    '''Averages the storms of the observations in indexList and writes them
+    to txtExport. names maps storm IDs to names. Returns the number of storms
+    written.'''
+    results = batchAvg.avgStorms(columns, numMeas, indexList)
+    scaleList.extend(results['scale'])
+    for n in range(len(results['obs'])):
+        i = results['obs'][n]
+        ID = columns['id'][i]
+        startYear = str(columns['year'][i])
+        start = (str(ID), startYear[0:3] + '0', startYear,
+                 '{0:2d}'.format(columns['month'][i]),
+                 '{0:2d}'.format(columns['day'][i]),
+                 '{0:2d}'.format(columns['hour'][i]), names[ID][0:10])
+        __writeLine(txtExport, start,
+                    (results['allLat'][n], results['allLon'][n]),
+                    (results['midLat'][n], results['midLon'][n]),
+                    (results['firstLat'][n], results['firstLon'][n]),
+                    (results['lastLat'][n], results['lastLon'][n]))
+    return len(results['obs'])
+
 def test():
     '''Test function.'''
     print('---Module coordExport test---')
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+'''
+Module for computing derived fields over whole columns of parsed HURDAT data.
+
+Works on the columns returned by hurdatReader.readColumns(). Categories are
+found with bisect on the Saffir-Simpson bounds (classifier.bounds), stage
+names from a table of stage codes, timestamps from the date columns (years
+already rolled over at 12/31 by the reader) and signed longitudes from the
+tenths of a degree in the file. Each distinct value is converted once, so
+the per observation work is a table lookup, and every exporter gets the same
+results.
+
+Import and call methods.
+
+@author: David Stack
+'''
+
+__all__ = ['categoryCodes', 'categoryNames', 'stageTable', 'stageNames',
+           'timestamps', 'signedLon', 'signedLons', 'derive', 'test']
+
+import bisect, calendar, classifier
+from array import array
+import hurdatReader as hr
+
+# Stage name of every stage character code (see hurdatReader.stageNames)
+stageTable = tuple(hr.stageNames.get(chr(code), chr(code)) for code in range(256))
+
+def __lookup(column, function, typecode):
+    '''Returns an array of function of every value in column, calling
+    function once per distinct value.'''
+    table = dict((value, function(value)) for value in set(column))
+    return array(typecode, map(table.__getitem__, column))
+
+def categoryCodes(winds):
+    '''Returns an array of category codes (index in classifier.categories) of
+    a wind column.'''
+    return __lookup(winds, lambda wind: bisect.bisect_right(classifier.bounds, wind), 'B')
+
+def categoryNames(winds):
+    '''Returns a list of the categories ('TD' to 'H5') of a wind column.'''
+    return [classifier.categories[code] for code in categoryCodes(winds)]
+
+def stageNames(stages):
+    '''Returns a list of the stage names of a stage code column.'''
+    return [stageTable[code] for code in stages]
+
+def timestamps(columns):
+    '''Returns an array of the UTC seconds since 1970 of every observation in
+    columns from hurdatReader.readColumns().'''
+    table = {}
+    times = array('q')
+    for key in zip(columns['year'], columns['month'], columns['day'], columns['hour']):
+        if key not in table:
+            table[key] = calendar.timegm(key + (0, 0))
+        times.append(table[key])
+    return times
+
+def signedLon(lon):
+    '''Returns a lon value (tenths of a degree west, 0 to 3599) as tenths of
+    a degree east, negative for west longitudes.'''
+    if lon >= 1800:
+        return 3600 - lon
+    return -lon
+
+def signedLons(lons):
+    '''Returns an array of signedLon() of a lon column.'''
+    return array('h', [3600 - lon if lon >= 1800 else -lon for lon in lons])
+
+def derive(columns):
+    '''Returns a dictionary with the 'category' codes, 'time' stamps and
+    'signedLon' tenths of every observation in columns.'''
+    return {'category':categoryCodes(columns['wind']),
+            'time':timestamps(columns),
+            'signedLon':signedLons(columns['lon'])}
+
+def test():
+    '''Test function.'''
+    print('---Module derivedFields test---')
+
+    print('***categoryNames Test***')
+    winds = list(range(0, 200))
+    known = [classifier.classify(wind) for wind in winds]
+    test = categoryNames(array('h', winds))
+    if known != test:
+        print('!!!---TEST FAIL---!!!')
+        print('Actual:', known)
+        print('Calc  :', test)
+    else:
+        print('PASS')
+
+    print('***signedLons Test***')
+    known = [-948, 0, 37, -1799, 1800]
+    test = list(signedLons(array('h', [948, 0, 3563, 1799, 1800])))
+    if known != test:
+        print('!!!---TEST FAIL---!!!')
+        print('Actual:', known)
+        print('Calc  :', test)
+    else:
+        print('PASS')
+
+    print('***timestamps Test***')
+    columns = {'year':[1970, 2005], 'month':[1, 8], 'day':[1, 29], 'hour':[6, 12]}
+    known = [21600, 1125316800]
+    test = list(timestamps(columns))
+    if known != test:
+        print('!!!---TEST FAIL---!!!')
+        print('Actual:', known)
+        print('Calc  :', test)
+    else:
+        print('PASS')
+
+# Run test if module is run as a program
+if __name__ == '__main__':
+    test()
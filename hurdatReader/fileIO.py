@@ -1,48 +1,360 @@
-#!/usr/bin/env python 3.2
+#!/usr/bin/env python3
 '''
 Module for reading and creating files on any OS.
 
+Files ending in .gz, .bz2 or .xz are read and written compressed (see
+openText()) and are streamed, so memory does not grow with the file size.
+Files made by makeTextFile() are written to a temporary file next to the
+target and renamed over it when closed, so readers never see a partial file
+and exports written at the same time from threads or processes do not mix.
+Binary files are written the same way through atomicPath(). Both resolve the
+target name from the write policy with resolveName().
+
 Import and call methods.
 
 @author: David Stack
 '''
 
-__all__ = ['openFile', 'makeTextFile', 'test']
+__all__ = ['openFile', 'openText', 'isCompressed', 'openColumns',
+           'makeTextFile', 'AtomicFile', 'tempName', 'resolveName', 'atomicPath',
+           'writePolicy',
+           'test']
+
+import os, itertools, threading, contextlib, gzip, bz2, lzma, hurdatReader, hurdatCache
+
+# Compressed file extensions with the module and write settings used for them
+# (the fastest level of each; gzip keeps close to plain text throughput, xz
+# about half and bz2 is several times slower at any level)
+compressors = {'.gz':(gzip, {'compresslevel':3}),
+               '.bz2':(bz2, {'compresslevel':1}),
+               '.xz':(lzma, {'preset':0})}
+
+# What makeTextFile() and resolveName() do when the file exists: 'overwrite'
+# it, 'skip' it, write a new 'version' (name_1.txt, name_2.txt, ...) or 'prompt'
+# the user
+writePolicy = 'overwrite'
+writePolicies = ('overwrite', 'skip', 'version', 'prompt')
+
+__tmpCount = itertools.count()
 
-import os
+def isCompressed(filename):
+    '''Returns True if the extension of filename is in compressors.'''
+    return os.path.splitext(filename)[1].lower() in compressors
+
+def openText(path, mode='r'):
+    '''Opens a text file, compressed if its extension is in compressors.
+
+    mode is 'r', 'w', 'x' or 'a'.'''
+    ext = os.path.splitext(path)[1].lower()
+    if ext in compressors:
+        module, options = compressors[ext]
+        if mode == 'r':
+            return module.open(path, 'rt')
+        return module.open(path, mode + 't', **options)
+    return open(path, mode)
 
 def openFile(filename, root=''):
-    '''Opens file for read on Windows, Mac, and Linux.'''
+    '''Opens file for read on Windows, Mac, and Linux. Compressed files are
+    decompressed as they are read (see openText()).'''
     path = os.path.join(root, filename)
-    hurdatData = open(path,'r')
+    hurdatData = openText(path,'r')
     return hurdatData
 
-def makeTextFile(filename):
-    '''Opens new file for write.'''
-    if os.path.isfile(filename):
-        print(filename, 'already exists.')
-        prompt = True
-        while prompt == True:
-            userInput = input('Overwrite (y/n)? ')
-            if userInput == ('y' or 'Y'):
-                f = open(filename,'w')
-                prompt = False
-            elif userInput == ('n' or 'N'):
-                newFilename = input('Enter new filename: ')
-                if not os.path.isfile(newFilename):
-                    f = open(newFilename,'w')
-                    prompt = False
-                else:
-                    print(newFilename, 'already exists.')
-            else:
-                print("Please enter either 'y' or 'n'.")
+def __countLines(hurdatData, profiler):
+    '''Yields the lines of hurdatData and counts them as 'linesRead'.'''
+    numLines = 0
+    for line in hurdatData:
+        numLines += 1
+        yield line
+    profiler.count('linesRead', numLines)
+
+def openColumns(filename, root='', cacheFile=None, profiler=None):
+    '''Returns parsed columns of a HURDAT data file (see
+    hurdatReader.readColumns()).
+
+    The columns are loaded from a memory mapped cache file (default is
+    filename + '.cache' next to the data file) when the cache matches the
+    size, modification time or hash of the data file. Otherwise the data file
+    is parsed and the cache is rebuilt. An enabled profiler.Profiler counts
+    'cacheHits' and 'linesRead'.'''
+    path = os.path.join(root, filename)
+    if cacheFile is None:
+        cacheFile = path + '.cache'
+    columns = hurdatCache.readCache(cacheFile, path)
+    if columns is not None:
+        if profiler is not None:
+            profiler.count('cacheHits')
     else:
-        f = open(filename,'w')
-    return f
+        key = hurdatCache.sourceKey(path)
+        hurdatData = openFile(path)
+        if profiler is not None and profiler.enabled:
+            columns = hurdatReader.readColumns(__countLines(hurdatData, profiler))
+        else:
+            columns = hurdatReader.readColumns(hurdatData)
+        hurdatData.close()
+        try:
+            hurdatCache.writeCache(columns, cacheFile, key)
+        except (OSError, UnicodeError) as err:
+            print('Could not save cache', cacheFile, '-', err)
+    return columns
+
+def tempName(filename):
+    '''Returns a new temporary filename next to filename, different for
+    every process, thread and call. A compressed extension is kept last, so
+    the temporary file is written with the same compression.'''
+    root, ext = os.path.splitext(filename)
+    if not isCompressed(filename):
+        root, ext = filename, ''
+    return '{0}.{1}-{2}-{3}.tmp{4}'.format(root, os.getpid(), threading.get_ident(),
+                                           next(__tmpCount), ext)
+
+@contextlib.contextmanager
+def atomicPath(filename, reserved=False):
+    '''Context manager for writing filename through a temporary file. Yields
+    the temporary filename (see tempName()), which is renamed to filename
+    when the block ends or removed if it raises. If reserved is set (see
+    resolveName()), the empty filename is also removed if the block raises.
+
+    filename, reserved = fileIO.resolveName(filename)
+    if filename is not None:
+        with fileIO.atomicPath(filename, reserved) as tmpName:
+            ...write tmpName...'''
+    tmpName = tempName(filename)
+    try:
+        yield tmpName
+    except BaseException:
+        if os.path.exists(tmpName):
+            os.remove(tmpName)
+        if reserved:
+            os.remove(filename)
+        raise
+    os.replace(tmpName, filename)
+
+class AtomicFile:
+    '''Text file written to a temporary file and renamed to filename when
+    closed. name is the final filename, which also picks the compression
+    (see openText()).
+
+    Use discard() (or a with block that raises) to remove the temporary file
+    and leave any existing file untouched. With skip set, writes are dropped
+    and nothing is saved. With reserved set, filename is an empty file made by
+    resolveName() and is also removed by discard().'''
+
+    def __init__(self, filename, skip=False, reserved=False):
+        self.name = filename
+        self.skip = skip
+        self.reserved = reserved
+        self.closed = False
+        self.tmpName = None
+        if not skip:
+            self.tmpName = tempName(filename)
+            self.file = openText(self.tmpName, 'x')
+
+    def write(self, text):
+        '''Writes text to the temporary file.'''
+        if not self.skip:
+            return self.file.write(text)
+        return len(text)
+
+    def close(self):
+        '''Closes the temporary file and renames it to name.'''
+        if self.closed:
+            return
+        self.closed = True
+        if not self.skip:
+            self.file.close()
+            os.replace(self.tmpName, self.name)
+
+    def discard(self):
+        '''Closes and removes the temporary file.'''
+        if self.closed:
+            return
+        self.closed = True
+        if not self.skip:
+            self.file.close()
+            os.remove(self.tmpName)
+            if self.reserved:
+                os.remove(self.name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        if excType is None:
+            self.close()
+        else:
+            self.discard()
+        return False
+
+def __reserve(filename):
+    '''Creates filename as an empty file and returns True, or returns False
+    if it exists. Only one of several concurrent writers gets True.'''
+    try:
+        os.close(os.open(filename, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+        return True
+    except FileExistsError:
+        return False
+
+def __reserveVersion(filename):
+    '''Creates and returns the first free name_n.ext of filename. The empty
+    file is created exclusively, so concurrent writers get different names.'''
+    root, ext = os.path.splitext(filename)
+    if isCompressed(filename):
+        root, innerExt = os.path.splitext(root)
+        ext = innerExt + ext
+    for n in itertools.count(1):
+        newFilename = '{0}_{1}{2}'.format(root, n, ext)
+        if __reserve(newFilename):
+            return newFilename
+
+def __promptFilename(filename):
+    '''Asks the user whether to overwrite filename and returns the filename to
+    write.'''
+    print(filename, 'already exists.')
+    while True:
+        userInput = input('Overwrite (y/n)? ')
+        if userInput in ('y', 'Y'):
+            return filename
+        elif userInput in ('n', 'N'):
+            newFilename = input('Enter new filename: ')
+            if not os.path.isfile(newFilename):
+                return newFilename
+            print(newFilename, 'already exists.')
+        else:
+            print("Please enter either 'y' or 'n'.")
+
+def resolveName(filename, policy=None):
+    '''Returns (name, reserved): the filename to write under policy, or None
+    if the file is skipped, and whether name was created as an empty file.
+
+    policy says what to do if the file exists (default is writePolicy):
+    'overwrite' replaces it, 'skip' keeps it, 'version' writes name_1.txt (or
+    the next free number) and 'prompt' asks the user. For 'skip' and
+    'version' the name is reserved by creating it exclusively, so concurrent
+    writers never pick the same name.'''
+    if policy is None:
+        policy = writePolicy
+    if policy not in writePolicies:
+        raise ValueError('Unknown write policy: {0}'.format(policy))
+    if policy == 'overwrite':
+        return filename, False
+    elif policy == 'prompt':
+        if os.path.isfile(filename):
+            filename = __promptFilename(filename)
+        return filename, False
+    elif __reserve(filename):
+        return filename, True
+    elif policy == 'skip':
+        print(filename, 'already exists, skipped.')
+        return None, False
+    return __reserveVersion(filename), True
+
+def makeTextFile(filename, policy=None):
+    '''Opens new file for write and returns an AtomicFile.
+
+    The name is resolved with policy (see resolveName()). A skipped file is
+    an AtomicFile that drops the writes.'''
+    name, reserved = resolveName(filename, policy)
+    if name is None:
+        return AtomicFile(filename, skip=True)
+    return AtomicFile(name, reserved=reserved)
 
 def test():
     '''Test function.'''
     print('---Module FileIO test---')
+    import tempfile, shutil
+    from concurrent.futures import ThreadPoolExecutor
+    workDir = tempfile.mkdtemp()
+    filename = os.path.join(workDir, 'out.txt')
+
+    def writeFile(text, policy, filename=filename):
+        with makeTextFile(filename, policy) as f:
+            f.write(text)
+        return None if f.skip else f.name
+
+    def readFile(name):
+        f = open(name)
+        text = f.read()
+        f.close()
+        return text
+
+    print('***Concurrent version Test***')
+    # Starts without out.txt, so every writer races for the bare name
+    pool = ThreadPoolExecutor(8)
+    names = list(pool.map(writeFile, [str(n) for n in range(20)], ['version'] * 20))
+    texts = [readFile(name) for name in names]
+    if (len(set(names)) != 20 or filename not in names or texts != [str(n) for n in range(20)]
+            or len(os.listdir(workDir)) != 20):
+        print('!!!---TEST FAIL---!!!')
+        print('Calc  :', names, texts)
+    else:
+        print('PASS')
+
+    print('***Concurrent skip Test***')
+    skipName = os.path.join(workDir, 'skip.txt')
+    names = list(pool.map(writeFile, [str(n) for n in range(20)], ['skip'] * 20,
+                          [skipName] * 20))
+    pool.shutdown()
+    written = [n for n in range(20) if names[n] is not None]
+    if len(written) != 1 or readFile(skipName) != str(written[0]):
+        print('!!!---TEST FAIL---!!!')
+        print('Calc  :', names)
+    else:
+        print('PASS')
+    os.remove(skipName)
+
+    print('***makeTextFile Test***')
+    writeFile('a', 'overwrite')
+    writeFile('b', 'overwrite')
+    writeFile('c', 'skip')
+    text = readFile(filename)
+    if text != 'b':
+        print('!!!---TEST FAIL---!!!')
+        print('Known :', 'b')
+        print('Calc  :', text)
+    else:
+        print('PASS')
+
+    print('***atomicPath Test***')
+    try:
+        with atomicPath(filename) as tmpName:
+            f = open(tmpName, 'w')
+            f.write('partial')
+            f.close()
+            raise RuntimeError('write failed')
+    except RuntimeError:
+        pass
+    name, reserved = resolveName(filename, 'version')
+    try:
+        with atomicPath(name, reserved) as tmpName:
+            raise RuntimeError('write failed')
+    except RuntimeError:
+        pass
+    text = readFile(filename)
+    if text != 'b' or len(os.listdir(workDir)) != 20:
+        print('!!!---TEST FAIL---!!!')
+        print('Calc  :', text, os.listdir(workDir))
+    else:
+        print('PASS')
+
+    print('***Compressed Test***')
+    for ext in compressors:
+        name = filename + ext
+        f = makeTextFile(name)
+        f.write('line 1\nline 2\n')
+        f.close()
+        f = open(name, 'rb')
+        raw = f.read(6)
+        f.close()
+        f = openFile(name)
+        lines = list(f)
+        f.close()
+        if lines != ['line 1\n', 'line 2\n'] or raw == b'line 1':
+            print('!!!---TEST FAIL---!!!')
+            print('Calc  :', ext, lines)
+        else:
+            print('PASS')
+    shutil.rmtree(workDir)
 
 # Run test if module is run as a program
 if __name__ == '__main__':
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+'''
+Module for caching parsed HURDAT data in a fixed layout binary file.
+
+The cache holds the columns returned by hurdatReader.readColumns() together
+with the size, modification time and SHA-1 hash of the source file. Loading
+memory maps the cache and returns the columns as memoryviews over the map, so
+nothing is decoded until it is used.
+
+Import and call methods.
+
+@author: David Stack
+'''
+
+__all__ = ['sourceKey', 'writeCache', 'readCache', 'test']
+
+import os, sys, struct, mmap, hashlib, fileIO, columnFile
+
+magic = b'HURDATC1'
+header = struct.Struct('=8s8sQq20sII')
+# Offset of the source mtime in header
+mtimeOffset = struct.calcsize('=8s8sQ')
+obsColumns = (('id', 'i'), ('year', 'h'), ('month', 'b'), ('day', 'b'),
+              ('hour', 'b'), ('lat', 'h'), ('lon', 'h'), ('wind', 'h'),
+              ('pressure', 'h'), ('stage', 'B'), ('landfall', 'b'))
+stormColumns = (('stormID', 'i'), ('stormYear', 'h'), ('stormLandfall', 'b'))
+
+def __hashFile(path):
+    '''Returns the SHA-1 digest of a file.'''
+    sha = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            sha.update(block)
+    return sha.digest()
+
+def sourceKey(path, hashSource=True):
+    '''Returns (size, mtime, sha1) of the source file used to key a cache.'''
+    stat = os.stat(path)
+    if hashSource:
+        sha = __hashFile(path)
+    else:
+        sha = b''
+    return (stat.st_size, stat.st_mtime_ns, sha)
+
+def writeCache(columns, filename, key):
+    '''Saves columns from hurdatReader.readColumns() to a cache file.
+
+    The columns are in the native byte order (see columnFile). The file is
+    written next to its destination and renamed into place, so a reader
+    never sees a partially written cache (see fileIO.atomicPath()).'''
+    numObs = len(columns['lat'])
+    numStorms = len(columns['stormID'])
+    with fileIO.atomicPath(filename) as tmpName, open(tmpName, 'wb') as f:
+        f.write(header.pack(magic, sys.byteorder.encode('ascii'), key[0],
+                            key[1], key[2], numObs, numStorms))
+        columnFile.writeColumns(f, columns, obsColumns, stormColumns)
+
+def __touchKey(filename, mtime):
+    '''Stores a new source mtime in the header of a cache file, so the next
+    load does not hash the source again. Does nothing if the cache cannot be
+    written.'''
+    try:
+        with open(filename, 'r+b') as f:
+            f.seek(mtimeOffset)
+            f.write(struct.pack('=q', mtime))
+    except OSError:
+        pass
+
+def readCache(filename, path):
+    '''Memory maps a cache file and returns its columns, or None if the cache
+    is missing, unreadable or was built from a different revision of the
+    source file at path.
+
+    If only the modification time of the source changed and its hash still
+    matches, the new time is stored in the cache.'''
+    try:
+        with open(filename, 'rb') as f:
+            buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+    view = memoryview(buf)
+    if len(view) < header.size:
+        return None
+    (fileMagic, byteorder, size, mtime, sha,
+     numObs, numStorms) = header.unpack(view[:header.size])
+    if fileMagic != magic or byteorder.rstrip(b'\0') != sys.byteorder.encode('ascii'):
+        return None
+    stat = os.stat(path)
+    if (size, mtime) != (stat.st_size, stat.st_mtime_ns):
+        if size != stat.st_size or sha != __hashFile(path):
+            return None
+        __touchKey(filename, stat.st_mtime_ns)
+
+    try:
+        return columnFile.readColumns(view, header.size, obsColumns, stormColumns,
+                                      numObs, numStorms)
+    except ValueError:
+        return None
+
+def test():
+    '''Test function.'''
+    print('---Module hurdatCache test---')
+    import tempfile, hurdatReader
+    path = os.path.join('..', 'data', 'HURDAT_tracks1851to2010_atl_2011rev.txt')
+    hurdatData = fileIO.openFile(path)
+    columns = hurdatReader.readColumns(hurdatData)
+    hurdatData.close()
+
+    print('***writeCache/readCache Test***')
+    workDir = tempfile.mkdtemp()
+    cacheName = os.path.join(workDir, 'test.cache')
+    writeCache(columns, cacheName, sourceKey(path))
+    cached = readCache(cacheName, path)
+    same = cached is not None
+    for name in columns:
+        if same and list(columns[name]) != list(cached[name]):
+            same = False
+    if not same:
+        print('!!!---TEST FAIL---!!!')
+        print('Cached columns do not match parsed columns')
+    else:
+        print('PASS')
+
+    print('***Touched source Test***')
+    import shutil
+    source = os.path.join(workDir, 'source.txt')
+    shutil.copyfile(path, source)
+    writeCache(columns, cacheName, sourceKey(source))
+    stat = os.stat(source)
+    os.utime(source, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    del cached
+    cached = readCache(cacheName, source)
+    f = open(cacheName, 'rb')
+    key = header.unpack(f.read(header.size))[2:4]
+    f.close()
+    known = (os.path.getsize(source), os.stat(source).st_mtime_ns)
+    if cached is None or key != known:
+        print('!!!---TEST FAIL---!!!')
+        print('Actual:', known)
+        print('Calc  :', key)
+    else:
+        print('PASS')
+    del cached
+
+    print('***Unencodable name Test***')
+    names = list(columns['stormName'])
+    columns['stormName'][0] = 'CÉSAR      '
+    try:
+        writeCache(columns, cacheName, sourceKey(source))
+        print('!!!---TEST FAIL---!!!')
+    except UnicodeError:
+        print('PASS')
+    columns['stormName'] = names
+    shutil.rmtree(workDir)
+
+# Run test if module is run as a program
+if __name__ == '__main__':
+    test()
@@ -1,4 +1,4 @@
-#!/usr/bin/env python 3.2
+#!/usr/bin/env python3
 '''
 Module for exporting data from a HURDAT data file.
 
@@ -6,96 +6,224 @@ Reads a HURDAT data file and saves a text file with the following rows:
 id, name, year, month, day, hour, lat, lon, windSpeed, pressure, stage,
 category, landfall
 
+Both exports take the category and stage names from derivedFields. The csv
+lon is signed (west negative, see derivedFields.signedLons()). The txt lon
+stays degrees west as in the HURDAT data file, because coordExport reads the
+txt file back and averages degrees west (see coordExport.exportToTXT()).
+
 Import and call methods.
 
 @author: David Stack
 '''
 
-__all__ = ['exportToCSV', 'exportToTXT', 'test']
+__all__ = ['exportToCSV', 'exportToTXT', 'exportColumnsToCSV',
+           'exportColumnsToTXT', 'iterCSVRows', 'iterTXTRows', 'formatCSV',
+           'formatTXT', 'exportParallel', 'test']
 
-import os, fileIO
+import os, time, contextlib, multiprocessing, fileIO, classifier, derivedFields
 import hurdatReader as hr
 
+csvHeader = 'ID, name, year, month, day, hour, lat, lon, wind, pressure, stage, category, landfall'
+txtHeader = '{0:6} {1:11}{2:4} {3:2} {4:2} {5:2} {6:6} {7:6} {8:2} {9:4} {10:16} {11} {12}'.format(
+    'ID', 'name', 'year', 'mo', 'da', 'hr', 'lat', 'lon', 'wi', 'pre','stage', 'ct', 'landfall')
+
 def exportToCSV(hurdatData, filename):
-    '''Loops through and saves HURDAT data as a csv file.'''
-    csvExport = fileIO.makeTextFile(filename)
-    csvExport.write('ID, name, year, month, day, hour, lat, lon, wind, pressure, stage, category, landfall')
-    print('Saving file...')
-    hourList = [0,6,12,18]
-    for line in hurdatData:
-        if hr.isHeader(line):
-            ID = hr.getStormID(line)
-            name = hr.getName(line).strip()
-            year = hr.getYear(line)
-            landfall = hr.madeLandfall(line)
-        elif hr.isFooter(line):
-            pass
-        else:
-            x = 11
-            y = 28
-            for i in range(4):
-                lon = hr.getLon(line, x, y)
-                if (hr.getLat(line, x, y) and lon != 0.0):
-                    if lon >= 180.0:
-                        lon = (lon - 360)*-1
-                    else:
-                        lon = lon * -1
-                    csvExport.write('\n')
-                    csvExport.write(str(ID))
-                    csvExport.write(', ' + name)
-                    csvExport.write(', ' + str(year))
-                    csvExport.write(', ' + str(hr.getMonth(line)))
-                    csvExport.write(', ' + str(hr.getDay(line)))
-                    csvExport.write(', ' + str(hourList[i])) # write hour
-                    csvExport.write(', ' + str(hr.getLat(line, x, y)))
-                    csvExport.write(', ' + str(lon))
-                    csvExport.write(', ' + str(hr.getWind(line, x, y)))
-                    csvExport.write(', ' + str(hr.getPressure(line, x, y)))
-                    csvExport.write(', ' + str(hr.getStage(line, x, y)))
-                    csvExport.write(', ' + str(hr.getCategory(line, x, y)))
-                    csvExport.write(', ' + str(landfall))
-                x = y
-                y = x + 17
-                if hr.getMonth(line) == 12 and hr.getDay(line) == 31 and hourList[i] == 18:
-                    year = year + 1                
-    csvExport.close()
-    print(csvExport.name, 'saved to', os.getcwd(), '\n')
+    '''Reads HURDAT data file and saves it as a csv file.'''
+    exportColumnsToCSV(hr.readColumns(hurdatData), filename)
 
 def exportToTXT(hurdatData, filename):
-    '''Loops through and saves HURDAT data as a txt file.'''
-    txtExport = fileIO.makeTextFile(filename)
-    txtExport.write('{0:6} {1:11}{2:4} {3:2} {4:2} {5:2} {6:6} {7:6} {8:2} {9:4} {10:16} {11} {12}'.format(
-        'ID', 'name', 'year', 'mo', 'da', 'hr', 'lat', 'lon', 'wi', 'pre','stage', 'ct', 'landfall'))
-    print('Saving file...')
-    hourList = [0,6,12,18]
-    for line in hurdatData:
-        if hr.isHeader(line):
-            ID = hr.getStormID(line)
-            name = hr.getName(line)
-            year = hr.getYear(line)
-            landfall = hr.madeLandfall(line)
-        elif hr.isFooter(line):
-            pass
-        else:
-            x = 11
-            y = 28
-            for i in range(4):
-                if (hr.getLat(line, x, y) and hr.getLon(line, x, y)) != 0.0:
-                    txtExport.write('\n')
-                    txtExport.write('{0} {1}{2} {3:2d} {4:2d} {5:2d} {6:5.1f} {7:6.1f} {8:3d} {9:4d} {10:16} {11} {12}'.format(
-                        ID, name, year,
-                        hr.getMonth(line), hr.getDay(line), hourList[i],
-                        hr.getLat(line,x,y), hr.getLon(line,x,y),
-                        hr.getWind(line,x,y), hr.getPressure(line,x,y),
-                        hr.getStage(line,x,y), hr.getCategory(line,x,y),
-                        landfall))
-                    #txtExport.write(' ' + str(hr.madeLandfall(line)))
-                x = y
-                y = x + 17
-                if hr.getMonth(line) == 12 and hr.getDay(line) == 31 and hourList[i] == 18:
-                    year = year + 1
-    txtExport.close()
-    print(txtExport.name, 'saved to', os.getcwd(), '\n')
+    '''Reads HURDAT data file and saves it as a txt file.'''
+    exportColumnsToTXT(hr.readColumns(hurdatData), filename)
+
+def exportColumnsToCSV(columns, filename, batchSize=4096):
+    '''Saves columns from hurdatReader.readColumns() as a csv file.
+
+    Rows are formatted and written batchSize rows at a time and the write
+    throughput is printed.'''
+    __writeRows(filename, csvHeader, iterCSVRows(columns), batchSize)
+
+def exportColumnsToTXT(columns, filename, batchSize=4096):
+    '''Saves columns from hurdatReader.readColumns() as a txt file.
+
+    Rows are formatted and written batchSize rows at a time and the write
+    throughput is printed.'''
+    __writeRows(filename, txtHeader, iterTXTRows(columns), batchSize)
+
+def __writeRows(filename, header, rows, batchSize):
+    '''Saves header and rows to filename in batches and prints throughput.
+
+    If formatting or writing fails the file is discarded (see
+    fileIO.AtomicFile). For compressed files (see fileIO.openText()) the
+    throughput is of the text before compression.'''
+    startTime = time.time()
+    numChars = 0
+    with fileIO.makeTextFile(filename) as export:
+        export.write(header)
+        print('Saving file...')
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= batchSize:
+                text = ''.join(batch)
+                numChars += len(text)
+                export.write(text)
+                batch = []
+        text = ''.join(batch)
+        numChars += len(text)
+        export.write(text)
+    seconds = max(time.time() - startTime, 1e-9)
+    size = os.path.getsize(export.name) / 1e6
+    print(export.name, 'saved to', os.getcwd())
+    if fileIO.isCompressed(export.name):
+        text = numChars / 1e6
+        print('{0:.2f} MB ({1:.2f} MB compressed) in {2:.2f} s ({3:.1f} MB/s)'.format(
+            text, size, seconds, text / seconds), '\n')
+    else:
+        print('{0:.2f} MB in {1:.2f} s ({2:.1f} MB/s)'.format(size, seconds, size / seconds), '\n')
+
+class __FormatCache(dict):
+    '''Dictionary that formats and keeps missing keys with function.'''
+    def __init__(self, function):
+        dict.__init__(self)
+        self.function = function
+
+    def __missing__(self, key):
+        value = self[key] = self.function(key)
+        return value
+
+def __stageCat(key):
+    '''Returns stage name and category of a (stage code, category code) key.'''
+    return derivedFields.stageTable[key[0]], classifier.categories[key[1]]
+
+def iterCSVRows(columns):
+    '''Yields the csv rows of columns from hurdatReader.readColumns(), each
+    starting with a newline.
+
+    Every field is formatted once per distinct value and rows are joined
+    from the formatted pieces.'''
+    dates = __FormatCache(lambda key: '{0}, {1}, {2}, {3}, '.format(*key))
+    lats = __FormatCache(lambda lat: str(lat / 10) + ', ')
+    lons = __FormatCache(lambda lon: str(lon / 10) + ', ')
+    numbers = __FormatCache(lambda num: str(num) + ', ')
+    tails = __FormatCache(lambda key: '{0}, {1}, '.format(*__stageCat(key)))
+    years = columns['year']
+    months = columns['month']
+    days = columns['day']
+    hours = columns['hour']
+    latColumn = columns['lat']
+    lonColumn = derivedFields.signedLons(columns['lon'])
+    winds = columns['wind']
+    cats = derivedFields.categoryCodes(winds)
+    pressures = columns['pressure']
+    stages = columns['stage']
+    stormStart = columns['stormStart']
+    for s in range(len(columns['stormID'])):
+        prefix = '\n{0}, {1}, '.format(columns['stormID'][s], columns['stormName'][s].strip())
+        landfall = str(columns['stormLandfall'][s])
+        for i in range(stormStart[s], stormStart[s+1]):
+            yield ''.join((prefix, dates[years[i], months[i], days[i], hours[i]],
+                           lats[latColumn[i]], lons[lonColumn[i]],
+                           numbers[winds[i]], numbers[pressures[i]],
+                           tails[stages[i], cats[i]], landfall))
+
+def iterTXTRows(columns):
+    '''Yields the txt rows of columns from hurdatReader.readColumns(), each
+    starting with a newline. lon is degrees west (see the module
+    documentation).
+
+    Every field is formatted once per distinct value and rows are joined
+    from the formatted pieces.'''
+    dates = __FormatCache(lambda key: '{0} {1:2d} {2:2d} {3:2d} '.format(*key))
+    lats = __FormatCache(lambda lat: '{0:5.1f} '.format(lat / 10))
+    lons = __FormatCache(lambda lon: '{0:6.1f} '.format(lon / 10))
+    winds3 = __FormatCache(lambda wind: '{0:3d} '.format(wind))
+    pressures4 = __FormatCache(lambda pressure: '{0:4d} '.format(pressure))
+    tails = __FormatCache(lambda key: '{0:16} {1} '.format(*__stageCat(key)))
+    years = columns['year']
+    months = columns['month']
+    days = columns['day']
+    hours = columns['hour']
+    latColumn = columns['lat']
+    lonColumn = columns['lon']
+    winds = columns['wind']
+    cats = derivedFields.categoryCodes(winds)
+    pressures = columns['pressure']
+    stages = columns['stage']
+    stormStart = columns['stormStart']
+    for s in range(len(columns['stormID'])):
+        prefix = '\n{0} {1}'.format(columns['stormID'][s], columns['stormName'][s])
+        landfall = str(columns['stormLandfall'][s])
+        for i in range(stormStart[s], stormStart[s+1]):
+            yield ''.join((prefix, dates[years[i], months[i], days[i], hours[i]],
+                           lats[latColumn[i]], lons[lonColumn[i]],
+                           winds3[winds[i]], pressures4[pressures[i]],
+                           tails[stages[i], cats[i]], landfall))
+
+def formatCSV(columns):
+    '''Returns the csv rows of columns from hurdatReader.readColumns(), each
+    starting with a newline.'''
+    return ''.join(iterCSVRows(columns))
+
+def formatTXT(columns):
+    '''Returns the txt rows of columns from hurdatReader.readColumns(), each
+    starting with a newline.'''
+    return ''.join(iterTXTRows(columns))
+
+def __formatShard(shard):
+    '''Process pool worker for exportParallel().'''
+    filename, start, stop, csv, txt = shard
+    columns = hr.readShard(filename, start, stop)
+    csvRows = txtRows = ''
+    if csv:
+        csvRows = formatCSV(columns)
+    if txt:
+        txtRows = formatTXT(columns)
+    return csvRows, txtRows
+
+def exportParallel(filename, csvName=None, txtName=None, processes=None):
+    '''Parses and formats a HURDAT data file in a process pool and saves the
+    same csv and/or txt files as exportToCSV() and exportToTXT().
+
+    The file is split at header lines (see hurdatReader.findShards()) and the
+    shards are written in file order as they finish. Compressed files (see
+    fileIO.openText()) cannot be split and are exported in this process. Call
+    from under "if __name__ == '__main__':" on platforms that spawn new
+    processes.'''
+    if fileIO.isCompressed(filename):
+        columns = hr.readColumnsParallel(filename)
+        if csvName is not None:
+            exportColumnsToCSV(columns, csvName)
+        if txtName is not None:
+            exportColumnsToTXT(columns, txtName)
+        return
+    if processes is None:
+        processes = multiprocessing.cpu_count()
+    shards = [(filename, start, stop, csvName is not None, txtName is not None)
+              for start, stop in hr.findShards(filename, processes * 4)]
+    exports = []
+    # Every file is saved when the block ends, or discarded if a worker fails
+    with contextlib.ExitStack() as stack:
+        if csvName is not None:
+            csvExport = stack.enter_context(fileIO.makeTextFile(csvName))
+            csvExport.write(csvHeader)
+            exports.append(csvExport)
+        if txtName is not None:
+            txtExport = stack.enter_context(fileIO.makeTextFile(txtName))
+            txtExport.write(txtHeader)
+            exports.append(txtExport)
+        print('Saving file...')
+        pool = multiprocessing.Pool(processes)
+        try:
+            for csvRows, txtRows in pool.imap(__formatShard, shards):
+                if csvName is not None:
+                    csvExport.write(csvRows)
+                if txtName is not None:
+                    txtExport.write(txtRows)
+        finally:
+            pool.close()
+            pool.join()
+    for export in exports:
+        print(export.name, 'saved to', os.getcwd(), '\n')
 
 def test():
     '''Test function.'''
@@ -1,4 +1,4 @@
-#!/usr/bin/env python 3.2
+#!/usr/bin/env python3
 '''
 Module for reading a HURDAT data file.
 
@@ -10,10 +10,17 @@ Import and call methods.
 __all__ = ['isHeader', 'isFooter', 'madeLandfall', 'getName', 'getYear',
            'getMonth', 'getDay', 'getStormNum', 'getNumDays', 'getDailyData',
            'getStage','getLat', 'getLon', 'getWind', 'getPressure',
-           'getCategory','test']
+           'getCategory', 'getStormID', 'readColumns', 'iterStormLines',
+           'iterStormColumns', 'findShards', 'readShard', 'mergeColumns',
+           'readColumnsParallel', 'test']
 
+import os, io
+from array import array
 import classifier
 
+stageNames = {'*':'Tropical Cyclone', 'S':'Subtropical', 'E':'Extratropical',
+              'W':'Wave', 'L':'Remnant Low'}
+
 def isHeader(line):
     '''Returns True if line is header, false if not.'''
     if line[17:19] == 'M=':
@@ -81,17 +88,7 @@ def getNumDays(line):
 def getStage(line, x, y):
     subLine = line[x:y]
     stage = subLine[0]
-    if stage == '*':
-        stage = 'Tropical Cyclone'
-    elif stage == 'S':
-        stage = 'Subtropical'
-    elif stage == 'E':
-        stage = 'Extratropical'
-    elif stage == 'W':
-        stage = 'Wave'
-    elif stage == 'L':
-        stage = 'Remnant Low'
-    return stage
+    return stageNames.get(stage, stage)
 
 def getLat(line, x, y):
     '''Returns the latitude for specific 6 hour measurement.'''
@@ -126,11 +123,171 @@ def getCategory(line, x, y):
     category = classifier.classify(getWind(line, x, y))
     return category
 
+def readColumns(hurdatData):
+    '''Reads a HURDAT data file in a single pass and returns a dictionary of
+    column arrays.
+
+    Observation columns ('id', 'year', 'month', 'day', 'hour', 'lat', 'lon',
+    'wind', 'pressure', 'stage', 'landfall') hold one entry for every 6 hour
+    measurement with a position. Lat and lon are kept in tenths of a degree
+    as written in the file (lon is degrees west) and stage holds the
+    character code of the stage (see stageNames). Storm columns ('stormID',
+    'stormName', 'stormYear', 'stormLandfall') hold one entry per storm and
+    'stormStart' holds the index of the first observation of each storm
+    followed by the total number of observations.'''
+    columns = {'id':array('i'), 'year':array('h'), 'month':array('b'),
+               'day':array('b'), 'hour':array('b'), 'lat':array('h'),
+               'lon':array('h'), 'wind':array('h'), 'pressure':array('h'),
+               'stage':array('B'), 'landfall':array('b'),
+               'stormID':array('i'), 'stormName':[], 'stormYear':array('h'),
+               'stormLandfall':array('b'), 'stormStart':array('i')}
+    addID = columns['id'].append
+    addYear = columns['year'].append
+    addMonth = columns['month'].append
+    addDay = columns['day'].append
+    addHour = columns['hour'].append
+    addLat = columns['lat'].append
+    addLon = columns['lon'].append
+    addWind = columns['wind'].append
+    addPressure = columns['pressure'].append
+    addStage = columns['stage'].append
+    addLandfall = columns['landfall'].append
+    numObs = 0
+    slots = ((0, 11), (6, 28), (12, 45), (18, 62))
+    for line in hurdatData:
+        if line[17:19] == 'M=':
+            ID = getStormID(line)
+            year = getYear(line)
+            landfall = madeLandfall(line)
+            columns['stormID'].append(ID)
+            columns['stormName'].append(getName(line))
+            columns['stormYear'].append(year)
+            columns['stormLandfall'].append(landfall)
+            columns['stormStart'].append(numObs)
+        elif isFooter(line):
+            pass
+        else:
+            month = int(line[6:8])
+            day = int(line[9:11])
+            for hour, x in slots:
+                lat = int(line[x+1:x+4])
+                lon = int(line[x+4:x+8])
+                if lat and lon:
+                    pressure = line[x+13:x+17]
+                    if pressure == '   0':
+                        pressure = -999
+                    addID(ID)
+                    addYear(year)
+                    addMonth(month)
+                    addDay(day)
+                    addHour(hour)
+                    addLat(lat)
+                    addLon(lon)
+                    addWind(int(line[x+9:x+12]))
+                    addPressure(int(pressure))
+                    addStage(ord(line[x]))
+                    addLandfall(landfall)
+                    numObs += 1
+            if month == 12 and day == 31:
+                year = year + 1
+    columns['stormStart'].append(numObs)
+    return columns
+
+def iterStormLines(hurdatData):
+    '''Yields the lines of each storm of a HURDAT data file, from its header
+    line through its footer.'''
+    lines = []
+    for line in hurdatData:
+        if isHeader(line) and lines:
+            yield lines
+            lines = []
+        lines.append(line)
+    if lines:
+        yield lines
+
+def iterStormColumns(hurdatData):
+    '''Yields readColumns() of each storm of a HURDAT data file in turn, so
+    only one storm is held in memory.'''
+    for lines in iterStormLines(hurdatData):
+        yield readColumns(lines)
+
+def findShards(filename, numShards):
+    '''Returns a list of (start, stop) byte ranges that split a HURDAT data
+    file into about numShards parts. Every range starts at a header line, so
+    each shard holds whole storms.'''
+    size = os.path.getsize(filename)
+    bounds = [0]
+    with open(filename, 'rb') as f:
+        for k in range(1, numShards):
+            offset = size * k // numShards
+            if offset <= bounds[-1]:
+                continue
+            f.seek(offset)
+            f.readline() # Skips partial line
+            pos = f.tell()
+            line = f.readline()
+            while line and line[17:19] != b'M=':
+                pos = f.tell()
+                line = f.readline()
+            if line and pos > bounds[-1]:
+                bounds.append(pos)
+    bounds.append(size)
+    return list(zip(bounds[:-1], bounds[1:]))
+
+def readShard(filename, start, stop):
+    '''Returns readColumns() of the byte range start to stop of filename.'''
+    with open(filename, 'rb') as f:
+        f.seek(start)
+        data = f.read(stop - start).decode('ascii')
+    return readColumns(io.StringIO(data, newline=None))
+
+def mergeColumns(columnsList):
+    '''Joins columns from readColumns() of consecutive shards into one.'''
+    merged = readColumns([])
+    for columns in columnsList:
+        offset = len(merged['lat'])
+        merged['stormStart'].pop()
+        merged['stormStart'].extend(start + offset for start in columns['stormStart'])
+        for name in columns:
+            if name != 'stormStart':
+                merged[name].extend(columns[name])
+    return merged
+
+def __readShard(shard):
+    '''Process pool worker for readColumnsParallel().'''
+    return readShard(*shard)
+
+def readColumnsParallel(filename, processes=None):
+    '''Parses a HURDAT data file in a process pool and returns the same
+    columns as readColumns().
+
+    The file is split at header lines (see findShards()) and the shards are
+    merged in file order. Compressed files (see fileIO.openText()) cannot be
+    split and are read in this process. Call from under
+    "if __name__ == '__main__':" on platforms that spawn new processes.'''
+    import fileIO, multiprocessing
+    if fileIO.isCompressed(filename):
+        hurdatData = fileIO.openFile(filename)
+        columns = readColumns(hurdatData)
+        hurdatData.close()
+        return columns
+    if processes is None:
+        processes = multiprocessing.cpu_count()
+    shards = [(filename, start, stop)
+              for start, stop in findShards(filename, processes * 4)]
+    pool = multiprocessing.Pool(processes)
+    try:
+        columnsList = pool.map(__readShard, shards)
+    finally:
+        pool.close()
+        pool.join()
+    return mergeColumns(columnsList)
+
 def test():
     '''Test function.'''
     print('---Module hurdatReader test---')
     import os, fileIO
-    hurdatData = fileIO.openFile('HURDAT_tracks1851to2010_atl_2011rev.txt', '..\\data')
+    hurdatData = fileIO.openFile('HURDAT_tracks1851to2010_atl_2011rev.txt', os.path.join('..', 'data'))
     hourList = [0,6,12,18]
     for line in hurdatData:
         if isHeader(line):
@@ -168,6 +325,23 @@ def test():
                 y = x + 17
                 if getMonth(line) == 12 and getDay(line) == 31 and hourList[i] == 18:
                     year = year + 1
+
+    print('\n***readColumns Test***')
+    hurdatData.seek(0, 0)
+    columns = readColumns(hurdatData)
+    hurdatData.seek(0, 0)
+    numObs = 0
+    for line in hurdatData:
+        if not (isHeader(line) or isFooter(line)):
+            for x in range(11, 79, 17):
+                if getLat(line, x, x + 17) and getLon(line, x, x + 17):
+                    numObs += 1
+    if numObs != len(columns['lat']) or numObs != columns['stormStart'][-1]:
+        print('!!!---TEST FAIL---!!!')
+        print('Actual:', numObs)
+        print('Calc  :', len(columns['lat']))
+    else:
+        print('PASS')
     hurdatData.close()
 
 # Run test if module is run as a program
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+'''
+Module for generating synthetic HURDAT data files.
+
+Writes random but format-valid storms (header line with M=, daily lines of
+four 6 hour measurements and a footer line) so the code can be timed on
+files many times the size of the Atlantic record.
+
+Import and call methods.
+
+@author: David Stack
+'''
+
+__all__ = ['atlanticStorms', 'makeStorm', 'makeFile', 'test']
+
+import random, datetime
+
+atlanticStorms = 1446 # Number of storms in the 1851-2010 Atlantic file
+
+def __slot(stage, lat, lon, wind, pressure):
+    '''Returns one 17 character 6 hour measurement.'''
+    return '{0}{1:3d}{2:4d} {3:3d} {4:4d}'.format(stage, lat, lon, wind, pressure)
+
+def makeStorm(rand, date, stormNum, card):
+    '''Returns the lines of one random storm starting on date and the next
+    card number.'''
+    numDays = rand.randint(2, 12)
+    landfall = rand.randint(0, 1)
+    name = rand.choice(['NOT NAMED', 'ABLE', 'BAKER', 'CHARLIE', 'DOG', 'EASY'])
+    lines = ['{0:05d} {1:%m/%d/%Y} M={2:2d} {3:2d} SNBR={4:4d} {5:11} XING={6} SSS=0'.format(
+        card, date, numDays, stormNum % 100, stormNum % 10000, name, landfall).ljust(80)]
+    card += 5
+    lat = rand.randint(100, 300)
+    lon = rand.randint(200, 1000)
+    wind = rand.randint(20, 40)
+    for day in range(numDays):
+        slots = []
+        for hour in range(4):
+            stage = rand.choice('***SEWL')
+            if (day == 0 and hour == 0 and rand.random() < 0.5) or rand.random() < 0.02:
+                slots.append(__slot('*', 0, 0, 0, 0))
+                continue
+            lat = min(lat + rand.randint(0, 8), 700)
+            lon = min(lon + rand.randint(-2, 10), 3599)
+            wind = max(10, min(wind + rand.randint(-10, 15), 165))
+            if rand.random() < 0.5:
+                pressure = 0
+            else:
+                pressure = 1010 - wind // 2
+            slots.append(__slot(stage, lat, lon, wind, pressure))
+        lines.append('{0:05d} {1:%m/%d}{2}*'.format(card, date, ''.join(slots)))
+        card += 5
+        date = date + datetime.timedelta(days=1)
+    lines.append('{0:05d} {1}'.format(card, rand.choice(['HR', 'TS', 'HRBTX1'])).ljust(28))
+    card += 5
+    return lines, card
+
+def makeFile(filename, numStorms=atlanticStorms, seed=0, startYear=1851):
+    '''Writes a synthetic HURDAT data file with numStorms storms (about 20 per
+    year) and returns its filename.'''
+    rand = random.Random(seed)
+    card = 5
+    f = open(filename, 'w')
+    for n in range(numStorms):
+        year = startYear + n // 20
+        if year > 9999:
+            year = startYear + (year - startYear) % (10000 - startYear)
+        date = datetime.date(year, 6, 1) + datetime.timedelta(days=rand.randint(0, 150))
+        lines, card = makeStorm(rand, date, n % 20 + 1, card % 100000)
+        f.write('\n'.join(lines) + '\n')
+    f.close()
+    return filename
+
+def test():
+    '''Test function.'''
+    print('---Module hurdatSynth test---')
+    import os, tempfile, hurdatReader
+    filename = makeFile(os.path.join(tempfile.mkdtemp(), 'synth.txt'), 50)
+
+    print('***makeFile Test***')
+    hurdatData = open(filename)
+    columns = hurdatReader.readColumns(hurdatData)
+    hurdatData.close()
+    if len(columns['stormID']) != 50 or len(columns['lat']) == 0:
+        print('!!!---TEST FAIL---!!!')
+        print('Storms:', len(columns['stormID']))
+    else:
+        print('PASS')
+    os.remove(filename)
+
+# Run test if module is run as a program
+if __name__ == '__main__':
+    test()
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+'''
+Module for updating the exports when a new HURDAT revision is released.
+
+A manifest (JSON) keeps a hash of every storm of the data file, from its
+header line through its footer, and the number of rows it added to each
+output. On a new data file only the storms that were added or changed are
+parsed, exported and averaged; the rows of unchanged storms are copied from
+the existing HURDAT_Export.* and Coord_Export*.txt files and the new rows are
+spliced in their place. Without a usable manifest every storm is processed.
+
+Import and call methods.
+
+@author: David Stack
+'''
+
+__all__ = ['stormHash', 'readManifest', 'update', 'test']
+
+import os, json, hashlib, fileIO, hurdatExport, coordExport
+import hurdatReader as hr
+
+def stormHash(lines):
+    '''Returns the sha1 hex digest of the lines of one storm.'''
+    return hashlib.sha1(''.join(lines).encode()).hexdigest()
+
+def readManifest(filename):
+    '''Returns the manifest saved by update() or None if there is none.'''
+    if not os.path.isfile(filename):
+        return None
+    f = open(filename)
+    try:
+        return json.load(f)
+    except ValueError:
+        return None
+    finally:
+        f.close()
+
+def __outputs(csvName, txtName, queries, numMeas):
+    '''Returns the list of outputs as stored in the manifest.'''
+    outputs = []
+    if csvName is not None:
+        outputs.append(['csv', csvName])
+    if txtName is not None:
+        outputs.append(['txt', txtName])
+    for query in queries:
+        if len(query) > 2:
+            searchType = query[2]
+        else:
+            searchType = 'and'
+        outputs.append(['coord', query[0], query[1], searchType, numMeas])
+    # Round trip so tuples compare equal to the lists read back from JSON
+    return json.loads(json.dumps(outputs))
+
+def __header(output):
+    '''Returns the header line of an output.'''
+    if output[0] == 'csv':
+        return hurdatExport.csvHeader
+    elif output[0] == 'txt':
+        return hurdatExport.txtHeader
+    else:
+        return coordExport.coordHeader
+
+def __readChunks(manifest, outputs):
+    '''Returns a dictionary of storm hash to the rows of that storm in each
+    existing output, or {} if the outputs do not match the manifest.'''
+    if manifest is None or manifest.get('outputs') != outputs:
+        return {}
+    storms = manifest['storms']
+    chunks = dict((storm[1], []) for storm in storms)
+    for k in range(len(outputs)):
+        if not os.path.isfile(outputs[k][1]):
+            return {}
+        f = open(outputs[k][1])
+        rows = f.read().split('\n')
+        f.close()
+        if rows[0] != __header(outputs[k]) or len(rows) - 1 != sum(s[2][k] for s in storms):
+            return {}
+        pos = 1
+        for ID, key, counts in storms:
+            chunks[key].append(''.join('\n' + row for row in rows[pos:pos+counts[k]]))
+            pos += counts[k]
+    return chunks
+
+def __formatStorm(lines, outputs, queries, numMeas, routes):
+    '''Parses one storm and returns its rows in each output.'''
+    columns = hr.readColumns(lines)
+    chunks = []
+    for output in outputs:
+        if output[0] == 'csv':
+            chunks.append(''.join(hurdatExport.iterCSVRows(columns)))
+        elif output[0] == 'txt':
+            chunks.append(''.join(hurdatExport.iterTXTRows(columns)))
+    if queries:
+        chunks.extend(coordExport.formatManyTXT(columns, queries, numMeas, routes))
+    return chunks
+
+def __save(filename, parts):
+    '''Writes parts to filename through a temporary file so a failed run
+    leaves the old file in place.'''
+    with fileIO.makeTextFile(filename, 'overwrite') as f:
+        for part in parts:
+            f.write(part)
+
+def update(hurdatData, manifestFile, csvName=None, txtName=None, queries=(), numMeas=4):
+    '''Updates the exports of a HURDAT data file using manifestFile.
+
+    csvName and txtName are the HURDAT_Export files (None to skip) and queries
+    are the coordinate exports as in coordExport.exportManyToTXT(). Storms
+    whose hash is in the manifest keep their existing rows and the others are
+    parsed and formatted again. The outputs are rewritten in data file order
+    and the manifest is saved. Returns (storms processed, total storms).'''
+    outputs = __outputs(csvName, txtName, queries, numMeas)
+    old = __readChunks(readManifest(manifestFile), outputs)
+    routes = {}
+    storms = []
+    stormChunks = []
+    numChanged = 0
+    for lines in hr.iterStormLines(hurdatData):
+        key = stormHash(lines)
+        if key in old:
+            chunks = old[key]
+        else:
+            chunks = __formatStorm(lines, outputs, queries, numMeas, routes)
+            numChanged += 1
+        storms.append([hr.getStormID(lines[0]), key, [chunk.count('\n') for chunk in chunks]])
+        stormChunks.append(chunks)
+    print('Saving file...')
+    for k in range(len(outputs)):
+        __save(outputs[k][1], [__header(outputs[k])] + [chunks[k] for chunks in stormChunks])
+        print(outputs[k][1], 'saved to', os.getcwd())
+    __save(manifestFile, [json.dumps({'outputs':outputs, 'storms':storms})])
+    print(numChanged, 'of', len(storms), 'storms processed\n')
+    return numChanged, len(storms)
+
+def test():
+    '''Test function.'''
+    print('---Module hurdatUpdate test---')
+    import io, shutil, tempfile, hurdatSynth
+    workDir = tempfile.mkdtemp()
+    oldFile = hurdatSynth.makeFile(os.path.join(workDir, 'old.txt'), 40)
+    f = open(oldFile)
+    oldLines = list(hr.iterStormLines(f))
+    f.close()
+    newFile = hurdatSynth.makeFile(os.path.join(workDir, 'new.txt'), 45, seed=1)
+    f = open(newFile)
+    newLines = list(hr.iterStormLines(f))
+    f.close()
+    # Revision: storm 3 is replaced and 5 storms are added
+    revision = oldLines[:3] + [newLines[3]] + oldLines[4:] + newLines[40:]
+    queries = [('coord.txt', {}), ('coordH.txt', {'cat':['H1','H2','H3','H4','H5']}, 'or')]
+
+    def run(directory, storms):
+        os.makedirs(directory, exist_ok=True)
+        data = io.StringIO(''.join(line for lines in storms for line in lines))
+        return update(data, os.path.join(directory, 'manifest.json'),
+                      os.path.join(directory, 'export.csv'),
+                      os.path.join(directory, 'export.txt'),
+                      [(os.path.join(directory, q[0]),) + q[1:] for q in queries])
+
+    print('***update Test***')
+    run(os.path.join(workDir, 'inc'), oldLines)
+    counts = run(os.path.join(workDir, 'inc'), revision)
+    run(os.path.join(workDir, 'full'), revision)
+    same = True
+    for name in ['export.csv', 'export.txt', 'coord.txt', 'coordH.txt']:
+        a = open(os.path.join(workDir, 'inc', name))
+        b = open(os.path.join(workDir, 'full', name))
+        same = same and a.read() == b.read()
+        a.close()
+        b.close()
+    if counts != (6, 45) or not same:
+        print('!!!---TEST FAIL---!!!')
+        print('Known :', (6, 45), True)
+        print('Calc  :', counts, same)
+    else:
+        print('PASS')
+    shutil.rmtree(workDir)
+
+# Run test if module is run as a program
+if __name__ == '__main__':
+    test()
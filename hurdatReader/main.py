@@ -1,44 +1,51 @@
-#!/usr/bin/env python 3.2
+#!/usr/bin/env python3
 '''
 Main file to run HURDAT analysis.
 
+Runs the "run" subcommand of cli.py with the settings below. See cli.py for
+the other subcommands (parse, storm, export, coords and cache warm).
+
 @author: David Stack
 '''
 
-import hurdatExport, fileIO, coordExport
-
-# Read HURDAT Data
-print('-----')
-print('Reading HURDAT data...')
-print('-----')
-hurdatData = fileIO.openFile('HURDAT_tracks1851to2010_atl_2011rev.txt', '..\\data')
-hurdatExport.exportToCSV(hurdatData, '..\\output\\HURDAT_Export.csv')
-hurdatData.seek(0, 0)
-hurdatExport.exportToTXT(hurdatData, '..\\output\\HURDAT_Export.txt')
-hurdatData.close()
-
-# Average coordinates with all observations
-print('-----')
-print('Saving average coordinates data...')
-print('-----')
-hurdatExportFile = fileIO.openFile('..\\output\\HURDAT_Export.txt')
-coordExport.exportToTXT(hurdatExportFile, '..\\output\\Coord_Export.txt')
-
-# Average coordinates using filters
-# Only category TS-H5 Storms
-hurdatExportFile.seek(0, 0)
-filterTerms = {'cat':['TS','H1','H2','H3','H4','H5']}
-coordExport.exportToTXT(hurdatExportFile, '..\\output\\Coord_Export_TS-H5.txt', filterTerms)
-# Only storms that made landfall
-hurdatExportFile.seek(0, 0)
-filterTerms = {'landfall':1}
-coordExport.exportToTXT(hurdatExportFile, '..\\output\\Coord_Export_Landfall.txt', filterTerms)
-# Only storms that made landfall and were category H3-H5
-hurdatExportFile.seek(0, 0)
-filterTerms = {'landfall':1,'cat':['H3','H4','H5']}
-coordExport.exportToTXT(hurdatExportFile, '..\\output\\Coord_Export_Landfall_H3-H5.txt', filterTerms)
-hurdatExportFile.close()
-
-print('-----')
-print('All files successfully created.')
-print('-----')
+import os, cli
+
+# Set to False to skip the text export (coordinates are averaged in memory)
+saveText = True
+
+# Set to True to also save the data as a SQLite database (see sqliteExport)
+saveSQLite = False
+
+# Set to True to also save the data as a memory mappable binary file (see
+# binaryExport)
+saveBinary = False
+
+# Set to True to only reprocess the storms added or changed since the last
+# run (see hurdatUpdate). The manifest of the last run is kept in manifestFile.
+incremental = False
+manifestFile = os.path.join('..', 'output', 'manifest.json')
+
+# Set to True to time each stage and count lines, observations and bytes.
+# Stages named in profileStages are also run under cProfile and the report is
+# saved as JSON to reportFile (None to only print it).
+profile = False
+profileStages = []
+reportFile = None
+
+argv = ['run', '--source', os.path.join('..', 'data', 'HURDAT_tracks1851to2010_atl_2011rev.txt'),
+        '--output-dir', os.path.join('..', 'output'), '--manifest', manifestFile]
+if not saveText:
+    argv.append('--no-text')
+if saveSQLite:
+    argv.append('--sqlite')
+if saveBinary:
+    argv.append('--binary')
+if incremental:
+    argv.append('--incremental')
+if profile:
+    argv.append('--profile')
+    for stage in profileStages:
+        argv += ['--profile-stage', stage]
+    if reportFile is not None:
+        argv += ['--report', reportFile]
+cli.main(argv)
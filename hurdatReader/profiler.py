@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+'''
+Module for timing and counting the stages of a HURDAT run.
+
+A Profiler records wall and CPU time of named stages and adds up counters
+(lines read, observations written, bytes written, ...). Any stage can also be
+run under cProfile. A disabled Profiler hands out one shared do-nothing stage
+and ignores counters, so it can be left in place in production.
+
+Import and call methods.
+
+@author: David Stack
+'''
+
+__all__ = ['Profiler', 'test']
+
+import io, json, time, cProfile, pstats
+
+class _NullStage:
+    '''Stage that does nothing, used when profiling is disabled.'''
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *excInfo):
+        return False
+
+class _Stage:
+    '''Times one run of a named stage and optionally runs it under cProfile.'''
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+        self.cProfile = None
+
+    def __enter__(self):
+        if self.name in self.profiler.profileStages:
+            self.cProfile = cProfile.Profile()
+            self.cProfile.enable()
+        self.wall = time.perf_counter()
+        self.cpu = time.process_time()
+        return self
+
+    def __exit__(self, *excInfo):
+        wall = time.perf_counter() - self.wall
+        cpu = time.process_time() - self.cpu
+        if self.cProfile is not None:
+            self.cProfile.disable()
+        self.profiler._addStage(self.name, wall, cpu, self.cProfile)
+        return False
+
+class Profiler:
+    '''Collects per stage times and counters of a run.
+
+    Use "with profiler.stage('name'):" around each stage and
+    profiler.count('name', n) for counters. profileStages names the stages
+    run under cProfile; their top functions are added to the report.'''
+
+    __nullStage = _NullStage()
+
+    def __init__(self, enabled=False, profileStages=()):
+        self.enabled = enabled
+        self.profileStages = set(profileStages)
+        self.stages = {}
+        self.order = []
+        self.counters = {}
+        self.profiles = {}
+
+    def stage(self, name):
+        '''Returns a context manager that times stage name.'''
+        if not self.enabled:
+            return self.__nullStage
+        return _Stage(self, name)
+
+    def count(self, name, value=1):
+        '''Adds value to counter name.'''
+        if self.enabled:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def _addStage(self, name, wall, cpu, profile):
+        '''Adds one timed run of stage name.'''
+        if name not in self.stages:
+            self.stages[name] = {'wall':0.0, 'cpu':0.0, 'calls':0}
+            self.order.append(name)
+        self.stages[name]['wall'] += wall
+        self.stages[name]['cpu'] += cpu
+        self.stages[name]['calls'] += 1
+        if profile is not None:
+            text = io.StringIO()
+            pstats.Stats(profile, stream=text).sort_stats('cumulative').print_stats(20)
+            self.profiles[name] = text.getvalue()
+
+    def report(self):
+        '''Returns the stages, counters and profiles as a dictionary.'''
+        return {'stages':[dict(self.stages[name], stage=name) for name in self.order],
+                'counters':dict(self.counters), 'profiles':dict(self.profiles)}
+
+    def printReport(self):
+        '''Prints the time of each stage and the counters.'''
+        if not self.enabled:
+            return
+        print('{0:20} {1:>9} {2:>9} {3:>6}'.format('stage', 'wall s', 'cpu s', 'calls'))
+        for name in self.order:
+            stage = self.stages[name]
+            print('{0:20} {1:9.3f} {2:9.3f} {3:6d}'.format(
+                name, stage['wall'], stage['cpu'], stage['calls']))
+        for name in sorted(self.counters):
+            print('{0:20} {1:>9}'.format(name, self.counters[name]))
+
+    def saveReport(self, filename):
+        '''Saves report() as a JSON file.'''
+        f = open(filename, 'w')
+        json.dump(self.report(), f, indent=1)
+        f.close()
+
+def test():
+    '''Test function.'''
+    print('---Module profiler test---')
+
+    print('***Profiler Test***')
+    profiler = Profiler(True, ['sum'])
+    with profiler.stage('sum'):
+        total = sum(range(100000))
+    profiler.count('items', 100000)
+    report = profiler.report()
+    if (report['stages'][0]['stage'] != 'sum' or report['counters'] != {'items':100000}
+            or 'sum' not in report['profiles']):
+        print('!!!---TEST FAIL---!!!')
+        print('Calc  :', report)
+    else:
+        print('PASS')
+
+    print('***Disabled Profiler Test***')
+    profiler = Profiler()
+    with profiler.stage('sum'):
+        total = sum(range(100000))
+    profiler.count('items', 100000)
+    if profiler.report() != {'stages':[], 'counters':{}, 'profiles':{}}:
+        print('!!!---TEST FAIL---!!!')
+        print('Calc  :', profiler.report())
+    else:
+        print('PASS')
+
+# Run test if module is run as a program
+if __name__ == '__main__':
+    test()
@@ -0,0 +1,376 @@
+#!/usr/bin/env python3
+'''
+Module for serving queries on parsed HURDAT data over local HTTP.
+
+A QueryServer loads the columns once (see fileIO.openColumns()) and answers
+JSON GET requests with asyncio:
+
+/storm?id=185101              storm name, year, landfall and time span
+/track?id=185101[&step=1]     fixes of a storm, optionally resampled every
+                              step hours (minStep to maxStep, see
+                              trackKinematics.resample())
+/averages?cat=H3,H4,H5&landfall=1[&stage=...][&search=or][&numMeas=4]
+                              coordExport averages of the filtered storms
+/stats                        request, cache and shared response counts
+
+Lists are comma separated and longitudes are signed degrees (negative west)
+as in HURDAT_Export.csv. Bad or missing parameters are answered with 400
+and unknown storms with 404. Responses are kept in a bounded LRU cache, so an
+identical query is answered without touching the data again. Queries that
+are not cached run in a thread pool, so slow ones (resampling, averages)
+do not hold up the other connections, and identical queries that arrive
+while one is running wait for its response. The server only listens on the
+loopback interface.
+
+Run as a program:
+    python queryServer.py [port]
+    python queryServer.py test
+
+@author: David Stack
+'''
+
+__all__ = ['LRUCache', 'QueryServer', 'serve', 'test']
+
+import os, sys, json, asyncio, ipaddress, collections, urllib.parse
+import fileIO, batchAvg, stormQuery, stormModel, trackKinematics, derivedFields
+
+# Resampling limits in hours, so a /track request stays small
+minStep = 0.1
+maxStep = 240
+
+# Parameters each path needs
+requiredParams = {'/storm':('id',), '/track':('id',)}
+
+class LRUCache:
+    '''Dictionary of at most maxSize items that drops the least recently
+    used item when full.'''
+
+    def __init__(self, maxSize=256):
+        self.maxSize = maxSize
+        self.items = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        '''Returns the value of key or None.'''
+        if key in self.items:
+            self.items.move_to_end(key)
+            self.hits += 1
+            return self.items[key]
+        self.misses += 1
+        return None
+
+    def put(self, key, value):
+        '''Adds key, dropping the least recently used item if full.'''
+        self.items[key] = value
+        self.items.move_to_end(key)
+        if len(self.items) > self.maxSize:
+            self.items.popitem(last=False)
+
+class QueryServer:
+    '''JSON query server over columns from hurdatReader.readColumns().'''
+
+    def __init__(self, columns, host='127.0.0.1', port=0, cacheSize=256):
+        if not ipaddress.ip_address(host).is_loopback:
+            raise ValueError('QueryServer only listens on loopback addresses')
+        self.columns = columns
+        self.host = host
+        self.port = port
+        self.cache = LRUCache(cacheSize)
+        self.storms = stormModel.Storms(columns)
+        self.query = stormQuery.StormQuery(columns)
+        self.requests = 0
+        self.shared = 0
+        self.running = {}
+        self.server = None
+        self.handlers = {'/storm':self.__storm, '/track':self.__track,
+                         '/averages':self.__averages, '/stats':self.__stats}
+
+    async def start(self):
+        '''Starts listening. port is set to the bound port.'''
+        self.server = await asyncio.start_server(self.__handle, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+
+    async def close(self):
+        '''Stops listening and waits for the server to close.'''
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def __handle(self, reader, writer):
+        '''Answers the requests of one connection.'''
+        try:
+            while True:
+                requestLine = await reader.readline()
+                if not requestLine:
+                    break
+                keepAlive = True
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    if line.lower().startswith(b'connection:') and b'close' in line.lower():
+                        keepAlive = False
+                parts = requestLine.decode('latin-1').split()
+                if len(parts) < 2 or parts[0] != 'GET':
+                    status, body = 405, {'error':'only GET is supported'}
+                    payload = json.dumps(body).encode()
+                else:
+                    status, payload = await self.respondAsync(parts[1])
+                writer.write('HTTP/1.1 {0} {1}\r\nContent-Type: application/json\r\n'
+                             'Content-Length: {2}\r\n\r\n'.format(
+                                 status, 'OK' if status == 200 else 'Error',
+                                 len(payload)).encode('latin-1') + payload)
+                await writer.drain()
+                if not keepAlive:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    def __lookup(self, target):
+        '''Returns (key, handler, params, response) of a request target.
+        response is the cached or error response, or None if handler has to
+        be called with params.'''
+        self.requests += 1
+        url = urllib.parse.urlsplit(target)
+        params = tuple(sorted(urllib.parse.parse_qsl(url.query)))
+        key = (url.path, params)
+        if url.path != '/stats':
+            cached = self.cache.get(key)
+            if cached is not None:
+                return key, None, None, cached
+        handler = self.handlers.get(url.path)
+        if handler is None:
+            return key, None, None, (404, json.dumps({'error':'unknown path ' + url.path}).encode())
+        params = dict(params)
+        for name in requiredParams.get(url.path, ()):
+            if name not in params:
+                return key, None, None, (400, json.dumps({'error':'missing parameter ' + name}).encode())
+        return key, handler, params, None
+
+    def __call(self, handler, params):
+        '''Returns (status, JSON bytes) of handler(params).'''
+        try:
+            return 200, json.dumps(handler(params)).encode()
+        except KeyError as err:
+            return 404, json.dumps({'error':'not found: {0}'.format(err)}).encode()
+        except (ValueError, OverflowError) as err:
+            return 400, json.dumps({'error':str(err)}).encode()
+
+    def __store(self, key, response):
+        '''Caches a successful response of key.'''
+        if response[0] == 200 and key[0] != '/stats':
+            self.cache.put(key, response)
+
+    def respond(self, target):
+        '''Returns (status, JSON bytes) of a request target such as
+        '/storm?id=185101'.'''
+        key, handler, params, response = self.__lookup(target)
+        if response is None:
+            response = self.__call(handler, params)
+            self.__store(key, response)
+        return response
+
+    async def respondAsync(self, target):
+        '''Returns respond(target), calling the handler in the default
+        executor of the event loop if the response is not cached.'''
+        key, handler, params, response = self.__lookup(target)
+        if response is not None:
+            return response
+        if key in self.running:
+            self.shared += 1
+            return await asyncio.shield(self.running[key])
+        future = asyncio.get_running_loop().run_in_executor(None, self.__call, handler, params)
+        self.running[key] = future
+        try:
+            response = await asyncio.shield(future)
+        finally:
+            del self.running[key]
+        self.__store(key, response)
+        return response
+
+    def __storm(self, params):
+        '''Returns summary of storm params['id'].'''
+        storm = self.storms.byID(int(params['id']))
+        result = {'id':storm.ID, 'name':storm.name, 'year':storm.year,
+                  'landfall':storm.landfall, 'observations':len(storm),
+                  'maxWind':storm.maxWind()}
+        if len(storm):
+            first = storm[0]
+            last = storm[-1]
+            result['start'] = [first.year, first.month, first.day, first.hour]
+            result['end'] = [last.year, last.month, last.day, last.hour]
+        return result
+
+    def __track(self, params):
+        '''Returns fixes of storm params['id'], resampled if params['step'].'''
+        storm = self.storms.byID(int(params['id']))
+        if 'step' in params:
+            step = float(params['step'])
+            if not minStep <= step <= maxStep:
+                raise ValueError('step must be from {0} to {1} hours'.format(minStep, maxStep))
+            track = trackKinematics.resampleStorm(self.columns, storm.number, step)
+            return {'id':storm.ID, 'time':list(track['time']), 'lat':list(track['lat']),
+                    'lon':list(track['lon']), 'wind':list(track['wind']),
+                    'pressure':[None if p != p else p for p in track['pressure']]}
+        return {'id':storm.ID,
+                'fixes':[[obs.year, obs.month, obs.day, obs.hour, obs.lat,
+                          derivedFields.signedLon(obs.lonTenths) / 10, obs.wind,
+                          obs.pressure, obs.stage.strip(), obs.category] for obs in storm]}
+
+    def __averages(self, params):
+        '''Returns coordExport averages of the storms passing the filter.'''
+        filterTerms = {}
+        for term in ('stage', 'cat'):
+            if term in params:
+                filterTerms[term] = params[term].split(',')
+        for term in ('landfall', 'year', 'decade'):
+            if term in params:
+                filterTerms[term] = int(params[term])
+        searchType = params.get('search', 'and')
+        if searchType not in ('and', 'or'):
+            raise ValueError('search must be and or or')
+        numMeas = int(params.get('numMeas', 4))
+        if filterTerms:
+            indexList = self.query.indices(self.query.select(filterTerms, searchType))
+        else:
+            indexList = None
+        results = batchAvg.avgStorms(self.columns, numMeas, indexList)
+        storms = []
+        for n in range(len(results['obs'])):
+            i = results['obs'][n]
+            storms.append({'id':self.columns['id'][i],
+                           'start':[self.columns['year'][i], self.columns['month'][i],
+                                    self.columns['day'][i], self.columns['hour'][i]],
+                           'all':[results['allLat'][n], -results['allLon'][n]],
+                           'mid':[results['midLat'][n], -results['midLon'][n]],
+                           'first':[results['firstLat'][n], -results['firstLon'][n]],
+                           'last':[results['lastLat'][n], -results['lastLon'][n]]})
+        return {'filter':filterTerms, 'search':searchType, 'numMeas':numMeas, 'storms':storms}
+
+    def __stats(self, params):
+        '''Returns request, cache and shared response counts.'''
+        return {'requests':self.requests, 'cacheHits':self.cache.hits,
+                'cacheMisses':self.cache.misses, 'cached':len(self.cache.items),
+                'shared':self.shared}
+
+def serve(filename, root='', port=8765, cacheSize=256):
+    '''Loads a HURDAT data file and serves it on localhost until interrupted.'''
+    server = QueryServer(fileIO.openColumns(filename, root), port=port, cacheSize=cacheSize)
+
+    async def run():
+        await server.start()
+        print('Serving on http://127.0.0.1:{0}'.format(server.port))
+        await server.server.serve_forever()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+
+def test():
+    '''Test function.'''
+    print('---Module queryServer test---')
+    import time
+    columns = fileIO.openColumns('HURDAT_tracks1851to2010_atl_2011rev.txt',
+                                 os.path.join('..', 'data'))
+    server = QueryServer(columns)
+
+    async def get(target):
+        reader, writer = await asyncio.open_connection('127.0.0.1', server.port)
+        writer.write('GET {0} HTTP/1.1\r\nHost: localhost\r\nConnection: close\r\n\r\n'.format(
+            target).encode())
+        await writer.drain()
+        response = await reader.read()
+        writer.close()
+        head, body = response.split(b'\r\n\r\n', 1)
+        return int(head.split()[1]), json.loads(body.decode())
+
+    async def run():
+        await server.start()
+        try:
+            print('***storm Test***')
+            status, storm = await get('/storm?id=185101')
+            if status != 200 or storm['name'] != 'NOT NAMED' or storm['start'] != [1851, 6, 25, 0]:
+                print('!!!---TEST FAIL---!!!')
+                print('Calc  :', status, storm)
+            else:
+                print('PASS')
+
+            print('***averages Test***')
+            status, result = await get('/averages?cat=H3,H4,H5&landfall=1')
+            known = batchAvg.avgStorms(columns, 4, server.query.indices(
+                server.query.select({'cat':['H3','H4','H5'], 'landfall':1})))
+            if status != 200 or [s['all'][0] for s in result['storms']] != list(known['allLat']):
+                print('!!!---TEST FAIL---!!!')
+                print('Calc  :', status, len(result['storms']))
+            else:
+                print('PASS')
+
+            print('***Bad parameters Test***')
+            test = []
+            for target in ('/track?id=185101&step=inf', '/track?id=185101&step=nan',
+                           '/track?id=185101&step=1e-9', '/track?id=185101&step=-1',
+                           '/storm', '/track?step=1', '/storm?id=abc', '/averages?year=1e999'):
+                status, body = await get(target)
+                test.append(status)
+            status, body = await get('/track?id=185101&step=0.1')
+            test.append(status)
+            known = [400] * 8 + [200]
+            if known != test:
+                print('!!!---TEST FAIL---!!!')
+                print('Actual:', known)
+                print('Calc  :', test)
+            else:
+                print('PASS')
+
+            print('***Concurrent requests Test***')
+            targets = ['/storm?id={0}'.format(ID) for ID in columns['stormID'][:100]]
+            targets += ['/track?id={0}'.format(ID) for ID in columns['stormID'][:100]]
+            targets += ['/averages?landfall=1'] * 100 + ['/storm?id=1'] * 5
+            startTime = time.perf_counter()
+            responses = await asyncio.gather(*[get(target) for target in targets])
+            seconds = time.perf_counter() - startTime
+            statuses = [status for status, body in responses]
+            status, stats = await get('/stats')
+            if statuses != [200] * 300 + [404] * 5 or stats['cacheHits'] + stats['shared'] < 99:
+                print('!!!---TEST FAIL---!!!')
+                print('Calc  :', collections.Counter(statuses), stats)
+            else:
+                print('PASS')
+            print('{0} requests in {1:.3f} s ({2:.2f} ms each)'.format(
+                len(targets), seconds, seconds * 1000 / len(targets)))
+
+            print('***Slow query Test***')
+            async def timed(target, delay=0):
+                await asyncio.sleep(delay)
+                startTime = time.perf_counter()
+                await get(target)
+                return time.perf_counter() - startTime
+            # Uncached averages and resampled tracks with a cached storm
+            # request sent while they run
+            slow = ['/averages?numMeas={0}'.format(n) for n in range(5, 9)]
+            slow += ['/track?id={0}&step=0.5'.format(ID) for ID in columns['stormID'][-4:]]
+            times = await asyncio.gather(*[timed(target) for target in slow],
+                                         timed('/storm?id=185101', 0.005))
+            if times[-1] >= max(times[:-1]) / 2:
+                print('!!!---TEST FAIL---!!!')
+            else:
+                print('PASS')
+            print('Cached request took {0:.1f} ms during {1:.1f} ms of slow queries'.format(
+                times[-1] * 1000, max(times[:-1]) * 1000))
+        finally:
+            await server.close()
+
+    asyncio.run(run())
+
+# Run as a program
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == 'test':
+        test()
+    else:
+        port = 8765
+        if len(sys.argv) > 1:
+            port = int(sys.argv[1])
+        serve('HURDAT_tracks1851to2010_atl_2011rev.txt', os.path.join('..', 'data'), port)
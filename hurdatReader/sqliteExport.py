@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+'''
+Module for exporting data from a HURDAT data file to a SQLite database.
+
+Saves a storms table (id, name, year, landfall) and an observations table
+(obs, storm, year, month, day, hour, lat, lon, wind, pressure, stage,
+category) with indexes on storm id, year, category, landfall and lat/lon.
+Lat and lon are degrees with west longitudes negative as in the csv export
+and missing pressures are NULL. The coordExport filters can be run as SQL on
+the database with selectObservations().
+
+Import and call methods.
+
+@author: David Stack
+'''
+
+__all__ = ['exportToSQLite', 'exportColumnsToSQLite', 'filterSQL',
+           'selectObservations', 'test']
+
+import os, sqlite3, fileIO, classifier, derivedFields
+import hurdatReader as hr
+
+schema = ['CREATE TABLE storms (id INTEGER PRIMARY KEY, name TEXT, year INTEGER, landfall INTEGER)',
+          'CREATE TABLE observations (obs INTEGER PRIMARY KEY, storm INTEGER REFERENCES storms(id), '
+          'year INTEGER, month INTEGER, day INTEGER, hour INTEGER, lat REAL, lon REAL, '
+          'wind INTEGER, pressure INTEGER, stage TEXT, category TEXT)']
+indexes = ['CREATE INDEX storms_year ON storms (year)',
+           'CREATE INDEX storms_landfall ON storms (landfall)',
+           'CREATE INDEX observations_storm ON observations (storm)',
+           'CREATE INDEX observations_year ON observations (year)',
+           'CREATE INDEX observations_category ON observations (category)',
+           'CREATE INDEX observations_lat_lon ON observations (lat, lon)']
+
+# SQL expression of each filter term (see selectObservations())
+termColumns = {'stage':'o.stage', 'cat':'o.category', 'landfall':'s.landfall',
+               'year':'o.year', 'decade':'o.year / 10 * 10'}
+
+def exportToSQLite(hurdatData, filename):
+    '''Reads HURDAT data file and saves it as a SQLite database.'''
+    exportColumnsToSQLite(hr.readColumns(hurdatData), filename)
+
+def __stormRows(columns):
+    '''Yields a storms table row for every storm in columns.'''
+    for s in range(len(columns['stormID'])):
+        yield (columns['stormID'][s], columns['stormName'][s].strip(),
+               columns['stormYear'][s], columns['stormLandfall'][s])
+
+def __observationRows(columns):
+    '''Yields an observations table row for every observation in columns.'''
+    derived = derivedFields.derive(columns)
+    stages = [name.strip() for name in derivedFields.stageTable]
+    for i in range(len(columns['lat'])):
+        pressure = columns['pressure'][i]
+        if pressure == -999:
+            pressure = None
+        yield (i, columns['id'][i], columns['year'][i], columns['month'][i],
+               columns['day'][i], columns['hour'][i], columns['lat'][i] / 10,
+               derived['signedLon'][i] / 10, columns['wind'][i], pressure,
+               stages[columns['stage'][i]], classifier.categories[derived['category'][i]])
+
+def exportColumnsToSQLite(columns, filename):
+    '''Saves columns from hurdatReader.readColumns() as a SQLite database.
+
+    All rows are inserted with executemany() in one transaction and the
+    indexes are built afterwards. The database is built in a temporary file
+    and renamed to filename. An existing database is replaced, kept or
+    versioned as fileIO.writePolicy says (see fileIO.resolveName()).'''
+    filename, reserved = fileIO.resolveName(filename)
+    if filename is None:
+        return
+    print('Saving file...')
+    with fileIO.atomicPath(filename, reserved) as tmpName:
+        connection = sqlite3.connect(tmpName)
+        try:
+            connection.execute('PRAGMA journal_mode = OFF')
+            connection.execute('PRAGMA synchronous = OFF')
+            with connection:
+                for statement in schema:
+                    connection.execute(statement)
+                connection.executemany('INSERT INTO storms VALUES (?, ?, ?, ?)', __stormRows(columns))
+                connection.executemany('INSERT INTO observations VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                                       __observationRows(columns))
+                for statement in indexes:
+                    connection.execute(statement)
+        finally:
+            connection.close()
+    print(filename, 'saved to', os.getcwd(), '\n')
+
+def filterSQL(filterTerms, searchType='and'):
+    '''Returns (where clause, parameters) of coordExport filterTerms.
+
+    As in coordExport and stormQuery, integer values must equal the field,
+    strings must contain it and other values (lists, ranges) must include
+    it. Terms can be 'stage', 'cat', 'landfall', 'year' and 'decade'.'''
+    clauses = []
+    params = []
+    for term in termColumns:
+        if term not in filterTerms:
+            continue
+        value = filterTerms[term]
+        if isinstance(value, int):
+            clauses.append('{0} = ?'.format(termColumns[term]))
+            params.append(value)
+        elif isinstance(value, str):
+            clauses.append('instr(?, {0}) > 0'.format(termColumns[term]))
+            params.append(value)
+        else:
+            value = list(value)
+            clauses.append('{0} IN ({1})'.format(termColumns[term], ', '.join('?' * len(value))))
+            params.extend(value)
+    if not clauses:
+        return '1', params
+    if searchType == 'and':
+        return ' AND '.join(clauses), params
+    else:
+        return ' OR '.join('({0})'.format(clause) for clause in clauses), params
+
+def selectObservations(connection, filterTerms={}, searchType='and', fields='o.obs'):
+    '''Returns the rows of fields of the observations in a database from
+    exportColumnsToSQLite() that pass filterTerms, in file order.
+
+    connection is an open sqlite3 connection. See filterSQL() for the filter
+    format. With the default fields the rows hold the observation index in
+    hurdatReader.readColumns().'''
+    where, params = filterSQL(filterTerms, searchType)
+    sql = 'SELECT {0} FROM observations o JOIN storms s ON o.storm = s.id WHERE {1} ORDER BY o.obs'.format(
+        fields, where)
+    return connection.execute(sql, params).fetchall()
+
+def test():
+    '''Test function.'''
+    print('---Module sqliteExport test---')
+    import tempfile, shutil, fileIO, stormQuery
+    columns = fileIO.openColumns('HURDAT_tracks1851to2010_atl_2011rev.txt',
+                                 os.path.join('..', 'data'))
+    workDir = tempfile.mkdtemp()
+    filename = os.path.join(workDir, 'HURDAT_Export.sqlite')
+    exportColumnsToSQLite(columns, filename)
+    connection = sqlite3.connect(filename)
+
+    print('***exportColumnsToSQLite Test***')
+    row = connection.execute('SELECT * FROM observations WHERE obs = 0').fetchone()
+    known = (0, 185101, 1851, 6, 25, 0, 28.0, -94.8, 80, None, 'Tropical Cyclone', 'H1')
+    if row != known:
+        print('!!!---TEST FAIL---!!!')
+        print('Actual:', known)
+        print('Calc  :', row)
+    else:
+        print('PASS')
+
+    print('***selectObservations Test***')
+    query = stormQuery.StormQuery(columns)
+    for filterTerms, searchType in [({}, 'and'),
+                                    ({'landfall':1, 'cat':['H3','H4','H5']}, 'and'),
+                                    ({'landfall':1, 'cat':['H3','H4','H5']}, 'or'),
+                                    ({'stage':'Tropical Cyclone', 'decade':1990}, 'and')]:
+        known = query.indices(query.select(filterTerms, searchType))
+        test = [row[0] for row in selectObservations(connection, filterTerms, searchType)]
+        if known != test:
+            print('!!!---TEST FAIL---!!!')
+            print('Filter:', filterTerms, searchType)
+            print('Actual:', len(known))
+            print('Calc  :', len(test))
+        else:
+            print('PASS')
+    connection.close()
+    shutil.rmtree(workDir)
+
+# Run test if module is run as a program
+if __name__ == '__main__':
+    test()
@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+'''
+Module with Storm and Observation views over parsed HURDAT data.
+
+The data stays in the compact column arrays returned by
+hurdatReader.readColumns() (or hurdatCache/fileIO.openColumns()), with lat
+and lon in integer tenths of a degree as HURDAT writes them. A Storm is a
+view of one storm's slice of those arrays and an Observation is a view of
+one 6 hour measurement. Both use __slots__ and are only created when asked
+for, so the whole record can be held and iterated without a Python object
+per measurement.
+
+Import and call methods.
+
+@author: David Stack
+'''
+
+__all__ = ['Observation', 'Storm', 'Storms', 'test']
+
+import classifier
+import hurdatReader as hr
+
+class Observation:
+    '''View of observation index of columns from hurdatReader.readColumns().
+
+    lat and lon are degrees (lon is degrees west as in HURDAT), latTenths and
+    lonTenths are the stored integers.'''
+    __slots__ = ('columns', 'index')
+
+    def __init__(self, columns, index):
+        self.columns = columns
+        self.index = index
+
+    @property
+    def ID(self):
+        return self.columns['id'][self.index]
+
+    @property
+    def year(self):
+        return self.columns['year'][self.index]
+
+    @property
+    def month(self):
+        return self.columns['month'][self.index]
+
+    @property
+    def day(self):
+        return self.columns['day'][self.index]
+
+    @property
+    def hour(self):
+        return self.columns['hour'][self.index]
+
+    @property
+    def latTenths(self):
+        return self.columns['lat'][self.index]
+
+    @property
+    def lonTenths(self):
+        return self.columns['lon'][self.index]
+
+    @property
+    def lat(self):
+        return self.columns['lat'][self.index] / 10
+
+    @property
+    def lon(self):
+        return self.columns['lon'][self.index] / 10
+
+    @property
+    def wind(self):
+        return self.columns['wind'][self.index]
+
+    @property
+    def pressure(self):
+        '''Pressure in mb or -999 if not measured.'''
+        return self.columns['pressure'][self.index]
+
+    @property
+    def stage(self):
+        '''Stage name (see hurdatReader.stageNames).'''
+        stage = chr(self.columns['stage'][self.index])
+        return hr.stageNames.get(stage, stage)
+
+    @property
+    def category(self):
+        return classifier.classify(self.columns['wind'][self.index])
+
+    @property
+    def landfall(self):
+        return self.columns['landfall'][self.index]
+
+    def __repr__(self):
+        return 'Observation({0}, {1}-{2:02d}-{3:02d} {4:02d}h, {5} {6})'.format(
+            self.ID, self.year, self.month, self.day, self.hour, self.latTenths, self.lonTenths)
+
+class Storm:
+    '''View of storm number of columns from hurdatReader.readColumns().
+
+    len() is the number of observations, indexing and iteration give
+    Observation views and column() gives a zero copy slice of any
+    observation column.'''
+    __slots__ = ('columns', 'number', 'start', 'stop')
+
+    def __init__(self, columns, number):
+        self.columns = columns
+        self.number = number
+        self.start = columns['stormStart'][number]
+        self.stop = columns['stormStart'][number + 1]
+
+    @property
+    def ID(self):
+        return self.columns['stormID'][self.number]
+
+    @property
+    def name(self):
+        return self.columns['stormName'][self.number].strip()
+
+    @property
+    def year(self):
+        return self.columns['stormYear'][self.number]
+
+    @property
+    def landfall(self):
+        return self.columns['stormLandfall'][self.number]
+
+    def column(self, name):
+        '''Returns a memoryview of observation column name of this storm.'''
+        return memoryview(self.columns[name])[self.start:self.stop]
+
+    def maxWind(self):
+        '''Returns the highest wind of the storm or 0 if it has no positions.'''
+        return max(self.column('wind'), default=0)
+
+    def __len__(self):
+        return self.stop - self.start
+
+    def __getitem__(self, k):
+        if k < 0:
+            k += len(self)
+        if not 0 <= k < len(self):
+            raise IndexError('observation index out of range')
+        return Observation(self.columns, self.start + k)
+
+    def __iter__(self):
+        for i in range(self.start, self.stop):
+            yield Observation(self.columns, i)
+
+    def __repr__(self):
+        return 'Storm({0}, {1!r}, {2} observations)'.format(self.ID, self.name, len(self))
+
+class Storms:
+    '''Sequence of Storm views over columns from hurdatReader.readColumns().'''
+    __slots__ = ('columns', '__numbers')
+
+    def __init__(self, columns):
+        self.columns = columns
+        self.__numbers = None
+
+    def __len__(self):
+        return len(self.columns['stormID'])
+
+    def __getitem__(self, number):
+        if number < 0:
+            number += len(self)
+        if not 0 <= number < len(self):
+            raise IndexError('storm index out of range')
+        return Storm(self.columns, number)
+
+    def __iter__(self):
+        for number in range(len(self)):
+            yield Storm(self.columns, number)
+
+    def byID(self, ID):
+        '''Returns the Storm with storm ID (e.g. 185101). Raises KeyError if
+        there is none.'''
+        if self.__numbers is None:
+            self.__numbers = dict((stormID, number) for number, stormID
+                                  in enumerate(self.columns['stormID']))
+        return Storm(self.columns, self.__numbers[ID])
+
+def test():
+    '''Test function.'''
+    print('---Module stormModel test---')
+    import os, tracemalloc, fileIO
+    hurdatData = fileIO.openFile('HURDAT_tracks1851to2010_atl_2011rev.txt', os.path.join('..', 'data'))
+    columns = hr.readColumns(hurdatData)
+    hurdatData.close()
+    storms = Storms(columns)
+
+    print('***Storm Test***')
+    storm = storms.byID(185101)
+    test = (storm.name, storm.landfall, len(storm), storm[0].latTenths, storm[0].lonTenths,
+            storm[0].category, storm[-1].ID)
+    known = ('NOT NAMED', 1, len(storm), 280, 948, 'H1', 185101)
+    if known != test or list(storm.column('lat')) != [obs.latTenths for obs in storm]:
+        print('!!!---TEST FAIL---!!!')
+        print('Actual:', known)
+        print('Calc  :', test)
+    else:
+        print('PASS')
+
+    print('***Memory Test***')
+    arrayBytes = sum(columns[name].itemsize * len(columns[name])
+                     for name in columns if name != 'stormName')
+    tracemalloc.start()
+    rows = [[obs.ID, storm.name, obs.year, obs.month, obs.day, obs.hour, obs.lat, obs.lon,
+             obs.wind, obs.pressure, obs.stage, obs.category, obs.landfall]
+            for storm in storms for obs in storm]
+    listBytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    print('Arrays: {0:.2f} MB, lists: {1:.2f} MB'.format(arrayBytes / 1e6, listBytes / 1e6))
+    if listBytes < 10 * arrayBytes:
+        print('!!!---TEST FAIL---!!!')
+    else:
+        print('PASS')
+    del rows
+
+# Run test if module is run as a program
+if __name__ == '__main__':
+    test()
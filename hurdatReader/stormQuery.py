@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+'''
+Module for answering filter queries on parsed HURDAT data with bitmap indexes.
+
+A StormQuery is built once over the columns returned by
+hurdatReader.readColumns(). It holds one bitmap (a Python int with bit i set
+for observation i) per stage, category, landfall flag, year and decade, so a
+filter is answered with bitwise and/or instead of a scan of the data.
+
+Import and call methods.
+
+@author: David Stack
+'''
+
+__all__ = ['StormQuery', 'test']
+
+import classifier
+import hurdatReader as hr
+
+class StormQuery:
+    '''Bitmap indexes over columns from hurdatReader.readColumns().
+
+    Filters use the coordExport format ({'stage':[...], 'cat':[...],
+    'landfall':1}) and can also use 'year' and 'decade'.'''
+
+    __bitTable = [[b for b in range(8) if byte >> b & 1] for byte in range(256)]
+
+    def __init__(self, columns):
+        self.columns = columns
+        self.numObs = len(columns['lat'])
+        self.allBits = (1 << self.numObs) - 1
+        self.indexes = {}
+        keyLists = {'stage':{}, 'cat':{}, 'landfall':{}, 'year':{}, 'decade':{}}
+        stages = columns['stage']
+        winds = columns['wind']
+        landfalls = columns['landfall']
+        years = columns['year']
+        for i in range(self.numObs):
+            stage = chr(stages[i])
+            keys = (('stage', hr.stageNames.get(stage, stage).strip()),
+                    ('cat', classifier.classify(winds[i])),
+                    ('landfall', landfalls[i]),
+                    ('year', years[i]),
+                    ('decade', years[i] // 10 * 10))
+            for term, key in keys:
+                keyLists[term].setdefault(key, []).append(i)
+        for term in keyLists:
+            self.indexes[term] = {}
+            for key in keyLists[term]:
+                self.indexes[term][key] = self.__toBitmap(keyLists[term][key])
+
+    def __toBitmap(self, indexList):
+        '''Returns a bitmap with the bits in indexList set.'''
+        bits = bytearray((self.numObs + 7) // 8)
+        for i in indexList:
+            bits[i >> 3] |= 1 << (i & 7)
+        return int.from_bytes(bits, 'little')
+
+    def __fromBitmap(self, bitmap):
+        '''Returns a list of the bits set in bitmap.'''
+        indexList = []
+        bits = bitmap.to_bytes((self.numObs + 7) // 8, 'little')
+        for byteNum in range(len(bits)):
+            if bits[byteNum]:
+                base = byteNum << 3
+                for b in self.__bitTable[bits[byteNum]]:
+                    indexList.append(base + b)
+        return indexList
+
+    def __matches(self, bitmaps, value):
+        '''Returns union of the bitmaps whose key matches a filter value.
+
+        Integers must be equal to the key, for other values (lists, ranges,
+        strings) the key must be in the value, as in coordExport filters.'''
+        bitmap = 0
+        if isinstance(value, int):
+            bitmap = bitmaps.get(value, 0)
+        else:
+            for key in bitmaps:
+                if key in value:
+                    bitmap |= bitmaps[key]
+        return bitmap
+
+    def select(self, filterTerms, searchType='and'):
+        '''Returns the bitmap of observations that pass filterTerms.
+
+        With searchType 'and' observations must pass every term, with 'or'
+        they must pass at least one. No terms selects everything.'''
+        bitmapList = [self.__matches(self.indexes[term], filterTerms[term])
+                      for term in self.indexes if term in filterTerms]
+        if not bitmapList:
+            return self.allBits
+        bitmap = bitmapList[0]
+        for other in bitmapList[1:]:
+            if searchType == 'and':
+                bitmap &= other
+            else:
+                bitmap |= other
+        return bitmap
+
+    def count(self, bitmap):
+        '''Returns the number of observations in bitmap.'''
+        return bin(bitmap).count('1')
+
+    def indices(self, bitmap):
+        '''Returns the observation indices in bitmap in file order.'''
+        return self.__fromBitmap(bitmap)
+
+    def stormIDs(self, bitmap):
+        '''Returns the IDs of the storms with observations in bitmap.'''
+        stormStart = self.columns['stormStart']
+        stormID = self.columns['stormID']
+        IDs = []
+        s = 0
+        for i in self.indices(bitmap):
+            while stormStart[s+1] <= i:
+                s += 1
+            if not IDs or IDs[-1] != stormID[s]:
+                IDs.append(stormID[s])
+        return IDs
+
+def test():
+    '''Test function.'''
+    print('---Module stormQuery test---')
+    import os, fileIO
+    columns = fileIO.openColumns('HURDAT_tracks1851to2010_atl_2011rev.txt',
+                                 os.path.join('..', 'data'))
+    query = StormQuery(columns)
+
+    print('***select Test***')
+    filterTerms = {'landfall':1, 'cat':['H3','H4','H5']}
+    test = query.indices(query.select(filterTerms))
+    known = [i for i in range(query.numObs)
+             if columns['landfall'][i] == 1 and
+             classifier.classify(columns['wind'][i]) in filterTerms['cat']]
+    if known != test:
+        print('!!!---TEST FAIL---!!!')
+        print('Actual:', len(known))
+        print('Calc  :', len(test))
+    else:
+        print('PASS')
+
+    print('***stormIDs Test***')
+    test = query.stormIDs(query.select({'year':1851}))
+    known = [ID for ID in columns['stormID'] if ID // 100 == 1851]
+    if known != test:
+        print('!!!---TEST FAIL---!!!')
+        print('Actual:', known)
+        print('Calc  :', test)
+    else:
+        print('PASS')
+
+# Run test if module is run as a program
+if __name__ == '__main__':
+    test()
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+'''
+Module for finding the storms active at a time or during a date window.
+
+A TimeIndex is built once over the columns returned by
+hurdatReader.readColumns(). Each storm is stored as the interval from its
+first to its last fix (UTC seconds, see derivedFields.timestamps()). The
+intervals are sorted by start and the time line is cut at every start and
+end into segments that list the storms active in them, so a point query is
+one binary search and a window query is two.
+
+Times can be given as UTC seconds, datetime objects or (year, month, day,
+hour) tuples.
+
+Import and call methods.
+
+@author: David Stack
+'''
+
+__all__ = ['TimeIndex', 'toTimestamp', 'test']
+
+import bisect, calendar, datetime, time
+from array import array
+import derivedFields
+
+def toTimestamp(value):
+    '''Returns UTC seconds of a datetime, a (year, month, day, hour) tuple or
+    a number of seconds.'''
+    if isinstance(value, datetime.datetime):
+        if value.tzinfo is not None:
+            value = value.astimezone(datetime.timezone.utc)
+        return calendar.timegm(value.timetuple())
+    if isinstance(value, tuple):
+        return calendar.timegm(tuple(value) + (0,) * (6 - len(value)))
+    return int(value)
+
+class TimeIndex:
+    '''Interval index of storms from hurdatReader.readColumns().
+
+    Queries return storm IDs ordered by the start of each storm.'''
+
+    def __init__(self, columns):
+        self.columns = columns
+        times = derivedFields.timestamps(columns)
+        stormStart = columns['stormStart']
+        intervals = []
+        for s in range(len(columns['stormID'])):
+            if stormStart[s] < stormStart[s+1]:
+                stormTimes = times[stormStart[s]:stormStart[s+1]]
+                intervals.append((min(stormTimes), max(stormTimes), s))
+        intervals.sort()
+        self.starts = array('q', [interval[0] for interval in intervals])
+        self.ends = array('q', [interval[1] for interval in intervals])
+        self.stormIDs = array('i', [columns['stormID'][interval[2]] for interval in intervals])
+        # Segment k runs from bounds[k] up to bounds[k+1] and holds the
+        # positions (in start order) of the storms active in it
+        events = []
+        for k in range(len(intervals)):
+            events.append((self.starts[k], 1, k))
+            events.append((self.ends[k] + 1, 0, k))
+        events.sort()
+        self.bounds = array('q')
+        self.active = []
+        current = set()
+        for t, isStart, k in events:
+            if isStart:
+                current.add(k)
+            else:
+                current.discard(k)
+            if self.bounds and self.bounds[-1] == t:
+                self.active[-1] = tuple(sorted(current))
+            else:
+                self.bounds.append(t)
+                self.active.append(tuple(sorted(current)))
+
+    def __activeAt(self, t):
+        '''Returns positions of the storms active at UTC seconds t.'''
+        k = bisect.bisect_right(self.bounds, t) - 1
+        if k < 0:
+            return ()
+        return self.active[k]
+
+    def activeAt(self, when):
+        '''Returns IDs of the storms active at when (first fix <= when <=
+        last fix).'''
+        return [self.stormIDs[k] for k in self.__activeAt(toTimestamp(when))]
+
+    def countAt(self, when):
+        '''Returns the number of storms active at when.'''
+        return len(self.__activeAt(toTimestamp(when)))
+
+    def activeBetween(self, first, last):
+        '''Returns IDs of the storms active at any time from first to last.
+
+        A storm overlaps the window if it is active at first or starts
+        inside the window.'''
+        first = toTimestamp(first)
+        last = toTimestamp(last)
+        if last < first:
+            return []
+        positions = set(self.__activeAt(first))
+        positions.update(range(bisect.bisect_left(self.starts, first),
+                               bisect.bisect_right(self.starts, last)))
+        return [self.stormIDs[k] for k in sorted(positions)]
+
+    def seasonConcurrency(self):
+        '''Returns a dictionary of the highest number of storms active at
+        the same time in each year.'''
+        seasons = {}
+        for k in range(len(self.bounds)):
+            if self.active[k]:
+                year = time.gmtime(self.bounds[k]).tm_year
+                seasons[year] = max(seasons.get(year, 0), len(self.active[k]))
+        return seasons
+
+def test():
+    '''Test function.'''
+    print('---Module timeIndex test---')
+    import os, random, fileIO
+    columns = fileIO.openColumns('HURDAT_tracks1851to2010_atl_2011rev.txt',
+                                 os.path.join('..', 'data'))
+    index = TimeIndex(columns)
+
+    def scan(first, last):
+        return [index.stormIDs[k] for k in range(len(index.starts))
+                if index.starts[k] <= last and index.ends[k] >= first]
+
+    print('***activeAt/activeBetween Test***')
+    rand = random.Random(0)
+    same = True
+    for n in range(200):
+        first = rand.randint(index.starts[0] - 86400, index.ends[-1] + 86400)
+        last = first + rand.choice([0, 0, 6 * 3600, 86400 * rand.randint(1, 60)])
+        same = (same and index.activeBetween(first, last) == scan(first, last) and
+                index.activeAt(first) == scan(first, first))
+    known = [200511, 200512] # Katrina and Lee
+    test = index.activeAt(datetime.datetime(2005, 8, 29, 12))
+    if not same or known != test:
+        print('!!!---TEST FAIL---!!!')
+        print('Actual:', known)
+        print('Calc  :', test)
+    else:
+        print('PASS')
+
+    print('***seasonConcurrency Test***')
+    seasons = index.seasonConcurrency()
+    print('Most storms at once in 2005:', seasons[2005])
+    print('Storms active in September 2010:',
+          len(index.activeBetween((2010, 9, 1), (2010, 9, 30, 18))))
+
+# Run test if module is run as a program
+if __name__ == '__main__':
+    test()
@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+'''
+Module for finding storm tracks near a point or inside a bounding box.
+
+A TrackIndex is built once over the columns returned by
+hurdatReader.readColumns(). Every track point is stored as a unit vector
+(see coordAvg.toCartesian()) in a lat/lon grid, so a radius or bounding box
+query only looks at the grid cells it covers. Longitudes are signed
+(negative west) as in HURDAT_Export.csv (see derivedFields.signedLons()).
+
+Import and call methods.
+
+@author: David Stack
+'''
+
+__all__ = ['TrackIndex', 'test']
+
+import math
+from array import array
+import coordAvg, stormQuery, derivedFields
+from coordAvg import earthRadius
+
+class TrackIndex:
+    '''Grid index of track points from hurdatReader.readColumns().
+
+    Queries return storm IDs in file order. filterTerms (see
+    stormQuery.StormQuery) limit the track points that are considered.'''
+
+    def __init__(self, columns, cellSize=1.0, query=None):
+        self.columns = columns
+        self.cellSize = cellSize
+        self.query = query
+        self.numObs = len(columns['lat'])
+        self.lats = array('d')
+        self.lons = array('d')
+        self.xs = array('d')
+        self.ys = array('d')
+        self.zs = array('d')
+        self.cells = {}
+        self.maxStep = 0.0
+        stormStart = columns['stormStart']
+        signedLons = derivedFields.signedLons(columns['lon'])
+        for s in range(len(columns['stormID'])):
+            for i in range(stormStart[s], stormStart[s+1]):
+                lat = columns['lat'][i] / 10
+                lon = signedLons[i] / 10
+                x, y, z = coordAvg.toCartesian(lat, lon)
+                self.lats.append(lat)
+                self.lons.append(lon)
+                self.xs.append(x)
+                self.ys.append(y)
+                self.zs.append(z)
+                self.cells.setdefault(self.__cell(lat, lon), []).append(i)
+                if i > stormStart[s]:
+                    step = max(abs(lat - self.lats[i-1]), abs(lon - self.lons[i-1]))
+                    self.maxStep = max(self.maxStep, step)
+
+    def __cell(self, lat, lon):
+        '''Returns grid cell of a point.'''
+        return (int(math.floor(lat / self.cellSize)),
+                int(math.floor(lon / self.cellSize)))
+
+    def __candidates(self, latMin, latMax, lonMin, lonMax):
+        '''Yields indices of points in grid cells covering a lat/lon box.'''
+        row0, col0 = self.__cell(latMin, lonMin)
+        row1, col1 = self.__cell(latMax, lonMax)
+        for row in range(row0, row1 + 1):
+            for col in range(col0, col1 + 1):
+                for i in self.cells.get((row, col), ()):
+                    yield i
+
+    def __filter(self, filterTerms, searchType):
+        '''Returns bitmap of points that pass filterTerms, or None for all.'''
+        if not filterTerms:
+            return None
+        if self.query is None:
+            self.query = stormQuery.StormQuery(self.columns)
+        return self.query.select(filterTerms, searchType)
+
+    def __toStormIDs(self, indexList):
+        '''Returns storm IDs of a list of point indices in file order.'''
+        IDs = []
+        for i in sorted(indexList):
+            ID = self.columns['id'][i]
+            if not IDs or IDs[-1] != ID:
+                IDs.append(ID)
+        return IDs
+
+    def nearPoints(self, lat, lon, radius, filterTerms={}, searchType='and'):
+        '''Returns indices of track points within radius km of lat/lon.'''
+        bitmap = self.__filter(filterTerms, searchType)
+        angle = radius / earthRadius
+        minDot = math.cos(min(angle, math.pi))
+        dLat = math.degrees(angle)
+        latMin = max(lat - dLat, -90.0)
+        latMax = min(lat + dLat, 90.0)
+        if latMin == -90.0 or latMax == 90.0 or angle >= math.pi / 2:
+            lonRanges = [(-180.0, 180.0)]
+        else:
+            dLon = math.degrees(math.asin(min(math.sin(angle) /
+                                              math.cos(math.radians(lat)), 1.0)))
+            lonRanges = [(lon - dLon, lon + dLon)]
+            if lon - dLon < -180.0:
+                lonRanges.append((lon - dLon + 360.0, 180.0))
+            if lon + dLon > 180.0:
+                lonRanges.append((-180.0, lon + dLon - 360.0))
+        x, y, z = coordAvg.toCartesian(lat, lon)
+        indexList = []
+        for lonMin, lonMax in lonRanges:
+            for i in self.__candidates(latMin, latMax, lonMin, lonMax):
+                if bitmap is not None and not bitmap >> i & 1:
+                    continue
+                if x * self.xs[i] + y * self.ys[i] + z * self.zs[i] >= minDot:
+                    indexList.append(i)
+        return sorted(set(indexList))
+
+    def nearStorms(self, lat, lon, radius, filterTerms={}, searchType='and'):
+        '''Returns IDs of storms that passed within radius km of lat/lon.'''
+        return self.__toStormIDs(self.nearPoints(lat, lon, radius,
+                                                 filterTerms, searchType))
+
+    def __crosses(self, i, j, latMin, latMax, lonMin, lonMax):
+        '''Returns True if the segment between points i and j crosses a box
+        (Liang-Barsky clipping in the lat/lon plane).'''
+        lat0 = self.lats[i]
+        lon0 = self.lons[i]
+        dLat = self.lats[j] - lat0
+        dLon = self.lons[j] - lon0
+        t0 = 0.0
+        t1 = 1.0
+        for p, q in ((-dLon, lon0 - lonMin), (dLon, lonMax - lon0),
+                     (-dLat, lat0 - latMin), (dLat, latMax - lat0)):
+            if p == 0:
+                if q < 0:
+                    return False
+            else:
+                t = q / p
+                if p < 0:
+                    t0 = max(t0, t)
+                else:
+                    t1 = min(t1, t)
+                if t0 > t1:
+                    return False
+        return True
+
+    def boxStorms(self, latMin, latMax, lonMin, lonMax, filterTerms={}, searchType='and'):
+        '''Returns IDs of storms with a track point inside or a track segment
+        crossing the bounding box.
+
+        A segment counts when both of its points pass filterTerms. Tracks
+        that cross the 180th meridian are not joined across it.'''
+        bitmap = self.__filter(filterTerms, searchType)
+        margin = self.maxStep
+        indexList = set()
+        IDs = self.columns['id']
+        for i in self.__candidates(latMin - margin, latMax + margin,
+                                   lonMin - margin, lonMax + margin):
+            if bitmap is not None and not bitmap >> i & 1:
+                continue
+            lat = self.lats[i]
+            lon = self.lons[i]
+            if latMin <= lat <= latMax and lonMin <= lon <= lonMax:
+                indexList.add(i)
+                continue
+            for j in (i - 1, i + 1):
+                if 0 <= j < self.numObs and IDs[j] == IDs[i]:
+                    if bitmap is not None and not bitmap >> j & 1:
+                        continue
+                    if self.__crosses(i, j, latMin, latMax, lonMin, lonMax):
+                        indexList.add(i)
+                        break
+        return self.__toStormIDs(indexList)
+
+def test():
+    '''Test function.'''
+    print('---Module trackIndex test---')
+    import os, fileIO
+    columns = fileIO.openColumns('HURDAT_tracks1851to2010_atl_2011rev.txt',
+                                 os.path.join('..', 'data'))
+    index = TrackIndex(columns)
+
+    print('***nearStorms Test***')
+    lat = 25.8
+    lon = -80.2
+    radius = 100.0
+    x, y, z = coordAvg.toCartesian(lat, lon)
+    known = []
+    for i in range(index.numObs):
+        dot = x * index.xs[i] + y * index.ys[i] + z * index.zs[i]
+        if math.acos(min(dot, 1.0)) * earthRadius <= radius:
+            if not known or known[-1] != columns['id'][i]:
+                known.append(columns['id'][i])
+    test = index.nearStorms(lat, lon, radius)
+    if known != test:
+        print('!!!---TEST FAIL---!!!')
+        print('Actual:', len(known))
+        print('Calc  :', len(test))
+    else:
+        print('PASS')
+
+    print('***boxStorms Test***')
+    box = (24.0, 31.0, -98.0, -80.0)
+    known = []
+    for i in range(index.numObs):
+        lat = index.lats[i]
+        lon = index.lons[i]
+        inside = box[0] <= lat <= box[1] and box[2] <= lon <= box[3]
+        if (i + 1 < index.numObs and columns['id'][i+1] == columns['id'][i]):
+            for k in range(1, 101):
+                t = k / 100
+                lat = index.lats[i] + t * (index.lats[i+1] - index.lats[i])
+                lon = index.lons[i] + t * (index.lons[i+1] - index.lons[i])
+                if box[0] <= lat <= box[1] and box[2] <= lon <= box[3]:
+                    inside = True
+        if inside and (not known or known[-1] != columns['id'][i]):
+            known.append(columns['id'][i])
+    test = index.boxStorms(box[0], box[1], box[2], box[3])
+    if known != test:
+        print('!!!---TEST FAIL---!!!')
+        print('Actual:', len(known))
+        print('Calc  :', len(test))
+    else:
+        print('PASS')
+
+# Run test if module is run as a program
+if __name__ == '__main__':
+    test()
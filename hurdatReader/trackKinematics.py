@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+'''
+Module for track kinematics and temporal resampling of parsed HURDAT data.
+
+Works on the columns returned by hurdatReader.readColumns(). stepFields()
+computes for every 6 hour step of every storm the great-circle distance
+from the previous fix, the forward speed, the heading and the rates of
+change of wind and pressure in one pass over unit vectors built from
+sine/cosine tables (see batchAvg.toCartesian()). resample() interpolates
+every track to hourly or any other interval along great circles.
+
+Longitudes of the results are signed degrees (negative west) as in
+HURDAT_Export.csv. Steps without a previous fix are NaN.
+
+Import and call methods.
+
+@author: David Stack
+'''
+
+__all__ = ['stepFields', 'resampleStorm', 'resample', 'test']
+
+import math, bisect
+from array import array
+import batchAvg, derivedFields
+from coordAvg import earthRadius
+
+nan = float('nan')
+
+def __vectors(columns):
+    '''Returns unit vectors x, y, z and signed lon tenths of every
+    observation.'''
+    lons = derivedFields.signedLons(columns['lon'])
+    xs, ys, zs = batchAvg.toCartesian(columns['lat'], lons)
+    return xs, ys, zs, lons
+
+def stepFields(columns):
+    '''Returns a dictionary of arrays with one entry per observation of
+    columns from hurdatReader.readColumns():
+
+    'hours' since the previous fix, 'distance' (km) and 'speed' (km/h) from
+    it, 'heading' (degrees clockwise from north) from it, 'windRate'
+    (knots/h) and 'pressureRate' (mb/h, NaN if either pressure is missing).
+    The first fix of each storm has NaN in every field.'''
+    xs, ys, zs, lons = __vectors(columns)
+    times = derivedFields.timestamps(columns)
+    winds = columns['wind']
+    pressures = columns['pressure']
+    stormStart = columns['stormStart']
+    fields = dict((name, array('d')) for name in
+                  ('hours', 'distance', 'speed', 'heading', 'windRate', 'pressureRate'))
+    hoursList = fields['hours']
+    distances = fields['distance']
+    speeds = fields['speed']
+    headings = fields['heading']
+    windRates = fields['windRate']
+    pressureRates = fields['pressureRate']
+    sqrt = math.sqrt
+    atan2 = math.atan2
+    degrees = math.degrees
+    for s in range(len(columns['stormID'])):
+        start = stormStart[s]
+        if start == stormStart[s+1]:
+            continue
+        for field in fields.values():
+            field.append(nan)
+        for i in range(start + 1, stormStart[s+1]):
+            ax, ay, az = xs[i-1], ys[i-1], zs[i-1]
+            bx, by, bz = xs[i], ys[i], zs[i]
+            cx = ay * bz - az * by
+            cy = az * bx - ax * bz
+            cz = ax * by - ay * bx
+            distance = atan2(sqrt(cx * cx + cy * cy + cz * cz), ax * bx + ay * by + az * bz) * earthRadius
+            # Heading is the step b - a in the east/north plane at a
+            hyp = sqrt(ax * ax + ay * ay)
+            if hyp:
+                dx, dy, dz = bx - ax, by - ay, bz - az
+                east = (-ay * dx + ax * dy) / hyp
+                north = dz * hyp - az * (ax * dx + ay * dy) / hyp
+                heading = degrees(atan2(east, north)) % 360.0
+            else:
+                heading = nan
+            hours = (times[i] - times[i-1]) / 3600
+            hoursList.append(hours)
+            distances.append(distance)
+            headings.append(heading)
+            if hours > 0:
+                speeds.append(distance / hours)
+                windRates.append((winds[i] - winds[i-1]) / hours)
+                if pressures[i] != -999 and pressures[i-1] != -999:
+                    pressureRates.append((pressures[i] - pressures[i-1]) / hours)
+                else:
+                    pressureRates.append(nan)
+            else:
+                speeds.append(nan)
+                windRates.append(nan)
+                pressureRates.append(nan)
+    return fields
+
+def __slerp(ax, ay, az, bx, by, bz, t):
+    '''Returns the point a fraction t along the great circle from a to b.'''
+    dot = max(-1.0, min(1.0, ax * bx + ay * by + az * bz))
+    omega = math.acos(dot)
+    if omega < 1e-12:
+        return ax, ay, az
+    sinOmega = math.sin(omega)
+    wa = math.sin((1 - t) * omega) / sinOmega
+    wb = math.sin(t * omega) / sinOmega
+    return wa * ax + wb * bx, wa * ay + wb * by, wa * az + wb * bz
+
+def __newTrack():
+    '''Returns empty resampled columns.'''
+    return {'id':array('i'), 'time':array('q'), 'lat':array('d'), 'lon':array('d'),
+            'wind':array('d'), 'pressure':array('d'), 'stormStart':array('i')}
+
+def __stormColumns(columns, start, stop):
+    '''Returns the columns of observations start to stop used by
+    __resampleStorm().'''
+    return dict((name, columns[name][start:stop]) for name in
+                ('year', 'month', 'day', 'hour', 'lat', 'lon', 'wind', 'pressure'))
+
+def __resampleStorm(track, ID, storm, step):
+    '''Appends the resampled fixes of one storm (see __stormColumns()) to
+    track.'''
+    if not len(storm['lat']):
+        return
+    xs, ys, zs, lons = __vectors(storm)
+    times = derivedFields.timestamps(storm)
+    winds = storm['wind']
+    pressures = storm['pressure']
+    for t in range(times[0], times[-1] + 1, step):
+        i = bisect.bisect_right(times, t) - 1
+        if i + 1 < len(times) and times[i+1] > times[i]:
+            f = (t - times[i]) / (times[i+1] - times[i])
+            j = i + 1
+        else:
+            f = 0.0
+            j = i
+        x, y, z = __slerp(xs[i], ys[i], zs[i], xs[j], ys[j], zs[j], f)
+        track['id'].append(ID)
+        track['time'].append(t)
+        track['lat'].append(math.degrees(math.atan2(z, math.sqrt(x * x + y * y))))
+        track['lon'].append(math.degrees(math.atan2(y, x)))
+        track['wind'].append(winds[i] + f * (winds[j] - winds[i]))
+        if pressures[i] != -999 and pressures[j] != -999:
+            track['pressure'].append(pressures[i] + f * (pressures[j] - pressures[i]))
+        else:
+            track['pressure'].append(nan)
+
+def resample(columns, stepHours=1, stormNumbers=None):
+    '''Returns every storm of columns from hurdatReader.readColumns()
+    resampled every stepHours hours from its first to its last fix.
+
+    Positions are interpolated along great circles, wind and pressure
+    linearly (pressure is NaN next to a missing pressure). Returns columns
+    'id', 'time' (UTC seconds), 'lat', 'lon', 'wind', 'pressure' and
+    'stormStart' as in hurdatReader.readColumns(). stormNumbers optionally
+    selects storms by position; only their observations are read, so the
+    time taken grows with the selected tracks and not with columns.'''
+    stormStart = columns['stormStart']
+    step = int(round(stepHours * 3600))
+    if step <= 0:
+        raise ValueError('stepHours must be positive')
+    if stormNumbers is None:
+        stormNumbers = range(len(columns['stormID']))
+    track = __newTrack()
+    for s in stormNumbers:
+        track['stormStart'].append(len(track['time']))
+        __resampleStorm(track, columns['stormID'][s],
+                        __stormColumns(columns, stormStart[s], stormStart[s+1]), step)
+    track['stormStart'].append(len(track['time']))
+    return track
+
+def resampleStorm(columns, s, stepHours=1):
+    '''Returns storm number s of columns resampled as in resample().'''
+    return resample(columns, stepHours, [s])
+
+def test():
+    '''Test function.'''
+    print('---Module trackKinematics test---')
+    import os, fileIO
+    columns = fileIO.openColumns('HURDAT_tracks1851to2010_atl_2011rev.txt',
+                                 os.path.join('..', 'data'))
+
+    print('***stepFields Test***')
+    fields = stepFields(columns)
+    # 1851/06/25 00Z 28.0N 94.8W to 06Z 28.0N 95.4W: west (great circle starts
+    # just north of west), 6 h
+    known = [6.0, 58.9, 9.8, 270.1]
+    test = [round(fields['hours'][1], 1), round(fields['distance'][1], 1),
+            round(fields['speed'][1], 1), round(fields['heading'][1], 1)]
+    if known != test or not math.isnan(fields['distance'][0]):
+        print('!!!---TEST FAIL---!!!')
+        print('Actual:', known)
+        print('Calc  :', test)
+    else:
+        print('PASS')
+
+    print('***resample Test***')
+    track = resample(columns, 1)
+    stormStart = columns['stormStart']
+    times = derivedFields.timestamps(columns)
+    worst = 0.0
+    same = True
+    for s in range(len(columns['stormID'])):
+        for i in range(stormStart[s], stormStart[s+1]):
+            k = track['stormStart'][s] + (times[i] - times[stormStart[s]]) // 3600
+            worst = max(worst, abs(track['lat'][k] - columns['lat'][i] / 10),
+                        abs(track['lon'][k] + columns['lon'][i] / 10) % 360)
+            same = same and track['wind'][k] == columns['wind'][i]
+    if worst > 1e-9 or not same:
+        print('!!!---TEST FAIL---!!!')
+        print('Largest difference at the fixes:', worst)
+    else:
+        print('PASS')
+    print('Hourly points:', len(track['time']))
+
+    print('***resampleStorm Test***')
+    storm = resampleStorm(columns, 100)
+    start, stop = track['stormStart'][100], track['stormStart'][101]
+    if any(list(storm[name]) != list(track[name][start:stop]) for name in ('time', 'lat', 'lon')):
+        print('!!!---TEST FAIL---!!!')
+        print('Calc  :', len(storm['time']), 'points')
+    else:
+        print('PASS')
+
+# Run test if module is run as a program
+if __name__ == '__main__':
+    test()